@@ -0,0 +1,22 @@
+from django.contrib import admin
+from users.admin import EstimatedCountPaginator
+from .models import Conversation, Message
+
+class ConversationAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user_low', 'user_high', 'created_at']
+    list_select_related = ['user_low', 'user_high']
+    # A plain select would render every user as an <option>.
+    autocomplete_fields = ['user_low', 'user_high']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+class MessageAdmin(admin.ModelAdmin):
+    list_display = ['id', 'conversation_id', 'sender', 'created_at']
+    list_select_related = ['sender']
+    autocomplete_fields = ['sender']
+    raw_id_fields = ['conversation']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+admin.site.register(Conversation, ConversationAdmin)
+admin.site.register(Message, MessageAdmin)
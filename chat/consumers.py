@@ -0,0 +1,70 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from users.matching import partner_index
+from users.metrics import registry
+
+from .models import Conversation, Message
+from .writer import writer
+
+
+def conversation_group(conversation_id):
+    return f'chat.{conversation_id}'
+
+
+@database_sync_to_async
+def _get_conversation(conversation_id, user_id):
+    conversation = Conversation.objects.filter(pk=conversation_id).first()
+    if conversation is None or not conversation.has_participant(user_id):
+        return None
+    # Partners who no longer match keep their history but cannot write.
+    if not partner_index.are_partners(user_id, conversation.other_participant_id(user_id)):
+        return None
+    return conversation
+
+
+class ChatConsumer(AsyncJsonWebsocketConsumer):
+    """
+    One socket per open conversation:
+
+        -> {"body": "Hi!"}
+        <- {"type": "message", "uid": "...", "sender": 3, "body": "Hi!", "created_at": "..."}
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+        conversation_id = self.scope['url_route']['kwargs']['conversation_id']
+        self.conversation = await _get_conversation(conversation_id, user.pk)
+        if self.conversation is None:
+            await self.close()
+            return
+        self.user_id = user.pk
+        self.group = conversation_group(self.conversation.pk)
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        await self.accept()
+        registry.inc('websocket_connections', consumer='chat')
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group'):
+            registry.dec('websocket_connections', consumer='chat')
+            await self.channel_layer.group_discard(self.group, self.channel_name)
+            await writer.flush()
+
+    async def receive_json(self, content, **kwargs):
+        if not isinstance(content, dict):
+            await self.send_json({'type': 'error', 'message': 'Send a JSON object.'})
+            return
+        body = str(content.get('body', '')).strip()
+        if not body or len(body) > Message.MAX_LENGTH:
+            await self.send_json({'type': 'error', 'message': 'Message must be 1-2000 characters.'})
+            return
+        message = Message(conversation_id=self.conversation.pk, sender_id=self.user_id, body=body)
+        # Deliver first, persistence is batched and must not add latency.
+        await self.channel_layer.group_send(self.group, {'type': 'chat.message', 'message': message.to_dict()})
+        await writer.add(message)
+
+    async def chat_message(self, event):
+        await self.send_json({'type': 'message', **event['message']})
@@ -0,0 +1,121 @@
+import asyncio
+import time
+
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from chat.models import Conversation, Message
+from chat.routing import websocket_urlpatterns
+from chat.writer import writer
+from users.benchmarks import benchmark_database, summarize, write_results
+from users.matching import partner_index
+from users.models import Language, User, UserLanguage
+
+# Batch size 1 writes every message in its own transaction, which is what
+# saving from the consumer would cost.
+SCENARIOS = {
+    'per_message_writes': 1,
+    'batched_writes': None,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test the chat consumer on a throwaway test database with an '
+        'in-memory channel layer: many concurrent conversations send messages '
+        'and the send-to-delivery latency (p50/p99) is reported for per-message '
+        'and batched persistence.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conversations', type=int, default=50)
+        parser.add_argument('--messages', type=int, default=40, help='Messages per conversation.')
+        parser.add_argument('--interval', type=float, default=0.005, help='Seconds between sends per sender.')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON.')
+
+    def handle(self, *args, **options):
+        layers = {'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+            'CONFIG': {'capacity': 10_000},
+        }}
+        results = {}
+        with benchmark_database(), override_settings(CHANNEL_LAYERS=layers):
+            pairs = self._seed(options['conversations'])
+            # The consumer only lets matched partners in, and bulk_create sent
+            # no signals to update the index.
+            partner_index.build()
+            for name, batch_size in SCENARIOS.items():
+                overrides = {'CHAT_BATCH_SIZE': batch_size} if batch_size else {}
+                with override_settings(**overrides):
+                    Message.objects.all().delete()
+                    flushes = writer.flushes
+                    latencies, elapsed = asyncio.run(
+                        self._run(pairs, options['messages'], options['interval'])
+                    )
+                    results[name] = summarize(latencies, elapsed)
+                    results[name]['transactions'] = writer.flushes - flushes
+                    results[name]['stored'] = Message.objects.count()
+            partner_index.clear()
+        results['config'] = {key: options[key] for key in ('conversations', 'messages', 'interval')}
+        write_results(self, results, options['json'])
+
+    def _seed(self, count):
+        # Reciprocal pairs: one of each is native in the language the other learns.
+        languages = Language.objects.bulk_create([
+            Language(code='xa', name='Load test A'), Language(code='xb', name='Load test B'),
+        ])
+        users = User.objects.bulk_create(
+            User(username=f'chat{i}', email=f'chat{i}@example.com', native_language=languages[i % 2])
+            for i in range(count * 2)
+        )
+        UserLanguage.objects.bulk_create(
+            UserLanguage(user=user, language=languages[(i + 1) % 2], proficiency='B1')
+            for i, user in enumerate(users)
+        )
+        return [
+            (Conversation.between(users[i], users[i + 1]), users[i], users[i + 1])
+            for i in range(0, len(users), 2)
+        ]
+
+    async def _run(self, pairs, count, interval):
+        application = URLRouter(websocket_urlpatterns)
+        sockets = []
+        for conversation, sender, receiver in pairs:
+            pair = []
+            for user in (sender, receiver):
+                communicator = WebsocketCommunicator(application, f'/ws/chat/{conversation.pk}/')
+                communicator.scope['user'] = user
+                connected, _ = await communicator.connect()
+                assert connected
+                pair.append(communicator)
+            sockets.append(pair)
+
+        sent_at = {}
+        latencies = []
+
+        async def send(communicator, key):
+            for i in range(count):
+                body = f'{key}:{i}'
+                sent_at[body] = time.perf_counter()
+                await communicator.send_json_to({'body': body})
+                await asyncio.sleep(interval)
+
+        async def receive(communicator):
+            for _ in range(count):
+                message = await communicator.receive_json_from(timeout=30)
+                latencies.append(time.perf_counter() - sent_at[message['body']])
+
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            task
+            for key, (sender, receiver) in enumerate(sockets)
+            for task in (send(sender, key), receive(receiver))
+        ))
+        elapsed = time.perf_counter() - start
+        await writer.flush()
+        for pair in sockets:
+            for communicator in pair:
+                await communicator.disconnect()
+        return latencies, elapsed
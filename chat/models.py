@@ -0,0 +1,64 @@
+import uuid
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class Conversation(models.Model):
+    # The pair is stored ordered by id so each pair has exactly one row.
+    user_low = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    user_high = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user_low', 'user_high'], name='chat_conversation_unique_pair'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_low_id} <-> {self.user_high_id}"
+
+    @classmethod
+    def between(cls, user_a, user_b):
+        low, high = sorted([user_a.pk, user_b.pk])
+        conversation, _created = cls.objects.get_or_create(user_low_id=low, user_high_id=high)
+        return conversation
+
+    @classmethod
+    def for_user(cls, user):
+        return cls.objects.filter(models.Q(user_low=user) | models.Q(user_high=user))
+
+    def has_participant(self, user_id):
+        return user_id in (self.user_low_id, self.user_high_id)
+
+    def other_participant_id(self, user_id):
+        return self.user_high_id if user_id == self.user_low_id else self.user_low_id
+
+
+class Message(models.Model):
+    MAX_LENGTH = 2000
+
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='messages')
+    sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    # Assigned when the message is received, before it reaches the database,
+    # so live and paginated copies of the same message can be matched up.
+    uid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    body = models.TextField(max_length=MAX_LENGTH)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['conversation', '-id'], name='chat_message_history_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.sender_id}: {self.body[:50]}"
+
+    def to_dict(self):
+        return {
+            'uid': str(self.uid),
+            'sender': self.sender_id,
+            'body': self.body,
+            'created_at': self.created_at.isoformat(),
+        }
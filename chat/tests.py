@@ -0,0 +1,314 @@
+import contextlib
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.db import IntegrityError
+from django.db import OperationalError
+from django.urls import reverse
+from unittest import mock
+from users.matching import partner_index
+from users.models import Language, UserLanguage
+from .models import Conversation, Message
+from .routing import websocket_urlpatterns
+from .writer import MessageWriter, writer
+
+User = get_user_model()
+
+
+def make_partners(first, second):
+    """Робить користувачів взаємними мовними партнерами"""
+    english, _ = Language.objects.get_or_create(code='en', defaults={'name': 'English'})
+    ukrainian, _ = Language.objects.get_or_create(code='uk', defaults={'name': 'Ukrainian'})
+    User.objects.filter(pk=first.pk).update(native_language=english)
+    User.objects.filter(pk=second.pk).update(native_language=ukrainian)
+    UserLanguage.objects.create(user=first, language=ukrainian, proficiency='B1')
+    UserLanguage.objects.create(user=second, language=english, proficiency='B1')
+    partner_index.clear()
+
+
+class ConversationModelTest(TestCase):
+    """Тести для моделі Conversation"""
+
+    def setUp(self):
+        """Налаштування тестових даних"""
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='testpass123')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', password='testpass123')
+
+    def test_between_is_symmetric(self):
+        """Тест що розмова між двома користувачами одна незалежно від порядку"""
+        conversation = Conversation.between(self.bob, self.alice)
+        self.assertEqual(Conversation.between(self.alice, self.bob), conversation)
+        self.assertEqual(conversation.user_low_id, min(self.alice.pk, self.bob.pk))
+        self.assertEqual(Conversation.objects.count(), 1)
+
+    def test_unique_pair(self):
+        """Тест унікальності пари учасників"""
+        Conversation.between(self.alice, self.bob)
+        low, high = sorted([self.alice.pk, self.bob.pk])
+        with self.assertRaises(IntegrityError):
+            Conversation.objects.create(user_low_id=low, user_high_id=high)
+
+    def test_participants(self):
+        """Тест перевірки учасників розмови"""
+        conversation = Conversation.between(self.alice, self.bob)
+        self.assertTrue(conversation.has_participant(self.alice.pk))
+        self.assertFalse(conversation.has_participant(0))
+        self.assertEqual(conversation.other_participant_id(self.alice.pk), self.bob.pk)
+        self.assertEqual(list(Conversation.for_user(self.bob)), [conversation])
+
+
+class ChatViewsTest(TestCase):
+    """Тести для представлень чату"""
+
+    def setUp(self):
+        """Налаштування тестових даних"""
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='testpass123')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', password='testpass123')
+        self.eve = User.objects.create_user(username='eve', email='eve@example.com', password='testpass123')
+        make_partners(self.eve, self.alice)
+        self.conversation = Conversation.between(self.alice, self.bob)
+        self.messages = Message.objects.bulk_create(
+            Message(conversation=self.conversation, sender=self.alice, body=f'Message {i}') for i in range(7)
+        )
+        self.url = reverse('chat_history', args=[self.conversation.pk])
+
+    def test_start_conversation(self):
+        """Тест створення розмови з партнером"""
+        self.client.force_login(self.eve)
+        response = self.client.post(reverse('chat_start', args=[self.alice.pk]))
+        conversation = Conversation.between(self.eve, self.alice)
+        self.assertRedirects(response, reverse('chat_conversation', args=[conversation.pk]))
+
+    def test_start_requires_matched_partner(self):
+        """Тест що розмову можна почати лише з підібраним партнером"""
+        self.client.force_login(self.eve)
+        response = self.client.post(reverse('chat_start', args=[self.bob.pk]))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.post(reverse('chat_start', args=[self.eve.pk]))
+        self.assertEqual(response.status_code, 404)
+        User.objects.filter(pk=self.alice.pk).update(is_active=False)
+        response = self.client.post(reverse('chat_start', args=[self.alice.pk]))
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Conversation.objects.exclude(pk=self.conversation.pk).exists())
+
+    def test_start_requires_post(self):
+        """Тест що розмова створюється лише POST-запитом"""
+        self.client.force_login(self.eve)
+        response = self.client.get(reverse('chat_start', args=[self.alice.pk]))
+        self.assertEqual(response.status_code, 405)
+
+    def test_history_pages(self):
+        """Тест курсорної пагінації історії від нових до старих"""
+        self.client.force_login(self.bob)
+        first = self.client.get(self.url, {'limit': 3}).json()
+        self.assertEqual([m['body'] for m in first['messages']], ['Message 6', 'Message 5', 'Message 4'])
+        self.assertEqual(first['next'], first['messages'][-1]['id'])
+
+        second = self.client.get(self.url, {'limit': 3, 'before': first['next']}).json()
+        self.assertEqual([m['body'] for m in second['messages']], ['Message 3', 'Message 2', 'Message 1'])
+
+        last = self.client.get(self.url, {'limit': 3, 'before': second['next']}).json()
+        self.assertEqual([m['body'] for m in last['messages']], ['Message 0'])
+        self.assertIsNone(last['next'])
+
+    def test_history_query_count(self):
+        """Тест що сторінка історії не залежить від кількості повідомлень"""
+        self.client.force_login(self.bob)
+        self.client.get(self.url)
+        with self.assertNumQueries(2):
+            self.client.get(self.url, {'before': self.messages[-1].pk})
+
+    def test_history_invalid_cursor(self):
+        """Тест некоректного курсора"""
+        self.client.force_login(self.bob)
+        self.assertEqual(self.client.get(self.url, {'before': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'limit': 0}).status_code, 400)
+
+    def test_outsider_gets_404(self):
+        """Тест що сторонній користувач не бачить розмову"""
+        self.client.force_login(self.eve)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        response = self.client.get(reverse('chat_conversation', args=[self.conversation.pk]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_conversation_list(self):
+        """Тест списку розмов"""
+        self.client.force_login(self.alice)
+        response = self.client.get(reverse('chat_conversations'))
+        self.assertContains(response, 'bob')
+        self.assertNotContains(response, 'eve')
+
+
+@override_settings(CHAT_FLUSH_INTERVAL=60)
+class ChatConsumerTest(TestCase):
+    """Тести для WebSocket-чату"""
+
+    def setUp(self):
+        """Налаштування тестових даних"""
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='testpass123')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', password='testpass123')
+        self.eve = User.objects.create_user(username='eve', email='eve@example.com', password='testpass123')
+        make_partners(self.alice, self.bob)
+        self.conversation = Conversation.between(self.alice, self.bob)
+        self.application = URLRouter(websocket_urlpatterns)
+
+    def tearDown(self):
+        partner_index.clear()
+
+    async def _connect(self, user, conversation_id=None):
+        path = f'/ws/chat/{conversation_id or self.conversation.pk}/'
+        communicator = WebsocketCommunicator(self.application, path)
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        return communicator, connected
+
+    async def test_message_delivered_then_persisted(self):
+        """Тест що повідомлення доставляється одразу, а зберігається пакетом"""
+        alice, connected = await self._connect(self.alice)
+        self.assertTrue(connected)
+        bob, _ = await self._connect(self.bob)
+
+        await alice.send_json_to({'body': 'Hello Bob'})
+        received = await bob.receive_json_from()
+        self.assertEqual(received['type'], 'message')
+        self.assertEqual(received['body'], 'Hello Bob')
+        self.assertEqual(received['sender'], self.alice.pk)
+        echo = await alice.receive_json_from()
+        self.assertEqual(echo['uid'], received['uid'])
+        self.assertFalse(await Message.objects.filter(uid=received['uid']).aexists())
+
+        await writer.flush()
+        writer._task.cancel()
+        message = await Message.objects.aget(uid=received['uid'])
+        self.assertEqual(message.body, 'Hello Bob')
+        await alice.disconnect()
+        await bob.disconnect()
+
+    async def test_invalid_body(self):
+        """Тест відхилення порожнього та задовгого повідомлення"""
+        alice, _ = await self._connect(self.alice)
+        await alice.send_json_to({'body': '   '})
+        self.assertEqual((await alice.receive_json_from())['type'], 'error')
+        await alice.send_json_to({'body': 'x' * (Message.MAX_LENGTH + 1)})
+        self.assertEqual((await alice.receive_json_from())['type'], 'error')
+        await alice.send_json_to(['Hello'])
+        self.assertEqual((await alice.receive_json_from())['type'], 'error')
+        self.assertEqual(len(writer), 0)
+        await alice.disconnect()
+
+    async def test_outsider_rejected(self):
+        """Тест що сторонній користувач не може підключитися до розмови"""
+        _, connected = await self._connect(self.eve)
+        self.assertFalse(connected)
+        _, connected = await self._connect(AnonymousUser())
+        self.assertFalse(connected)
+
+    async def test_unmatched_participant_rejected(self):
+        """Тест що учасник, який більше не є партнером, не може писати"""
+        await UserLanguage.objects.filter(user=self.bob).adelete()
+        partner_index.clear()
+        _, connected = await self._connect(self.alice)
+        self.assertFalse(connected)
+
+    async def test_disconnect_flushes_queue(self):
+        """Тест що при відключенні черга повідомлень записується"""
+        alice, _ = await self._connect(self.alice)
+        await alice.send_json_to({'body': 'Bye'})
+        await alice.receive_json_from()
+        await alice.disconnect()
+        self.assertEqual(len(writer), 0)
+        self.assertTrue(await Message.objects.filter(body='Bye').aexists())
+        writer._task.cancel()
+
+
+class MessageWriterTest(TestCase):
+    """Тести для пакетного запису повідомлень"""
+
+    def setUp(self):
+        """Налаштування тестових даних"""
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='testpass123')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', password='testpass123')
+        self.conversation = Conversation.between(self.alice, self.bob)
+
+    def _message(self, i):
+        return Message(conversation=self.conversation, sender=self.alice, body=f'Message {i}')
+
+    @override_settings(CHAT_BATCH_SIZE=2, CHAT_FLUSH_INTERVAL=60)
+    async def test_flushes_full_batches(self):
+        """Тест що повний пакет записується одразу однією транзакцією"""
+        batch_writer = MessageWriter()
+        with mock.patch('chat.writer.Message.objects.bulk_create', wraps=Message.objects.bulk_create) as bulk_create:
+            for i in range(5):
+                await batch_writer.add(self._message(i))
+            self.assertEqual(batch_writer.flushes, 2)
+            self.assertEqual(len(batch_writer), 1)
+            await batch_writer.flush()
+        self.assertEqual([len(call.args[0]) for call in bulk_create.call_args_list], [2, 2, 1])
+        self.assertEqual(await Message.objects.acount(), 5)
+
+    @override_settings(CHAT_BATCH_SIZE=100, CHAT_FLUSH_INTERVAL=0)
+    async def test_flushes_after_interval(self):
+        """Тест що неповний пакет записується після інтервалу"""
+        batch_writer = MessageWriter()
+        for i in range(3):
+            await batch_writer.add(self._message(i))
+        await batch_writer._task
+        self.assertEqual(batch_writer.flushes, 1)
+        self.assertEqual(await Message.objects.acount(), 3)
+
+    @override_settings(CHAT_FLUSH_INTERVAL=60)
+    async def test_bad_rows_do_not_drop_the_batch(self):
+        """Тест що помилкове повідомлення не забирає з собою весь пакет"""
+        batch_writer = MessageWriter()
+        stored = self._message(0)
+        await stored.asave()
+        duplicate = self._message(1)
+        duplicate.uid = stored.uid
+        await batch_writer.add(self._message(2))
+        await batch_writer.add(duplicate)
+        with self.assertLogs('chat.writer', 'WARNING'):
+            await batch_writer.flush()
+        batch_writer._task.cancel()
+        self.assertEqual(len(batch_writer), 0)
+        self.assertEqual(
+            sorted([body async for body in Message.objects.values_list('body', flat=True)]),
+            ['Message 0', 'Message 2'],
+        )
+
+    @override_settings(CHAT_FLUSH_INTERVAL=60)
+    async def test_failed_batch_is_kept(self):
+        """Тест що пакет повертається в чергу, якщо база недоступна"""
+        batch_writer = MessageWriter()
+        await batch_writer.add(self._message(0))
+        with mock.patch('chat.writer._write', side_effect=OperationalError('database is locked')):
+            with self.assertLogs('chat.writer', 'ERROR'):
+                await batch_writer.flush()
+        self.assertEqual(len(batch_writer), 1)
+        await batch_writer.flush()
+        batch_writer._task.cancel()
+        self.assertEqual(len(batch_writer), 0)
+        self.assertEqual(await Message.objects.acount(), 1)
+
+
+class ChatLoadTestCommandTest(TransactionTestCase):
+    """Тест що команда навантажувального тесту чату відпрацьовує"""
+
+    def tearDown(self):
+        partner_index.clear()
+
+    def test_small_run(self):
+        """Тест запуску з малими параметрами на тестовій базі"""
+        out = StringIO()
+        # Тестова база вже створена раннером, окрема не потрібна.
+        with mock.patch('chat.management.commands.chat_loadtest.benchmark_database', contextlib.nullcontext):
+            call_command('chat_loadtest', '--conversations', '2', '--messages', '2', '--interval', '0', '--json',
+                         stdout=out)
+        results = json.loads(out.getvalue())
+        for name in ('per_message_writes', 'batched_writes'):
+            self.assertEqual(results[name]['stored'], 4)
@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('', views.conversation_list, name='chat_conversations'),
+    path('start/<int:user_id>/', views.start_conversation, name='chat_start'),
+    path('<int:conversation_id>/', views.conversation_detail, name='chat_conversation'),
+    path('<int:conversation_id>/messages/', views.message_history, name='chat_history'),
+]
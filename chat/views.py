@@ -0,0 +1,75 @@
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.http import require_POST
+
+from users.matching import partner_index
+from users.models import User
+from .models import Conversation
+
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+
+
+def _get_conversation(request, conversation_id):
+    conversation = get_object_or_404(Conversation, pk=conversation_id)
+    if not conversation.has_participant(request.user.pk):
+        raise Http404
+    return conversation
+
+
+@login_required
+def conversation_list(request):
+    conversations = list(Conversation.for_user(request.user).order_by('-created_at'))
+    partners = User.objects.in_bulk(c.other_participant_id(request.user.pk) for c in conversations)
+    items = [(c, partners.get(c.other_participant_id(request.user.pk))) for c in conversations]
+    return render(request, 'chat/conversation_list.html', {'conversations': items})
+
+
+@login_required
+@require_POST
+def start_conversation(request, user_id):
+    partner = get_object_or_404(User, pk=user_id, is_active=True)
+    # Chat is for matched partners only, not for any account id.
+    if not partner_index.are_partners(request.user.pk, partner.pk):
+        raise Http404
+    conversation = Conversation.between(request.user, partner)
+    return redirect('chat_conversation', conversation_id=conversation.pk)
+
+
+@login_required
+def conversation_detail(request, conversation_id):
+    conversation = _get_conversation(request, conversation_id)
+    partner = User.objects.get(pk=conversation.other_participant_id(request.user.pk))
+    return render(request, 'chat/conversation.html', {'conversation': conversation, 'partner': partner})
+
+
+@login_required
+def message_history(request, conversation_id):
+    """
+    Newest-first history, one page per request.
+
+    Pages are cut by message id (``?before=<id>``) rather than by offset, so
+    each page is a range scan on chat_message_history_idx no matter how far
+    back the reader scrolls. ``next`` is the cursor for the following page,
+    null once the start of the conversation is reached.
+    """
+    conversation = _get_conversation(request, conversation_id)
+    try:
+        before = int(request.GET['before']) if request.GET.get('before') else None
+        limit = min(int(request.GET.get('limit', HISTORY_PAGE_SIZE)), HISTORY_MAX_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({'error': 'before and limit must be integers.'}, status=400)
+    if limit < 1:
+        return JsonResponse({'error': 'limit must be positive.'}, status=400)
+
+    messages = conversation.messages.order_by('-id')
+    if before is not None:
+        messages = messages.filter(id__lt=before)
+    page = list(messages.only('id', 'conversation_id', 'uid', 'sender_id', 'body', 'created_at')[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+    return JsonResponse({
+        'messages': [{'id': message.pk, **message.to_dict()} for message in page],
+        'next': page[-1].pk if has_more else None,
+    })
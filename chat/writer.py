@@ -0,0 +1,100 @@
+"""
+Batched message persistence.
+
+Messages are delivered to the other participant straight away through the
+channel layer and queued here for storage. The queue is written with one
+bulk_create per CHAT_BATCH_SIZE messages or CHAT_FLUSH_INTERVAL seconds,
+whichever comes first, so a burst of messages costs a single transaction.
+
+A batch that breaks a constraint (its conversation was deleted meanwhile)
+is written again row by row so only the bad messages are dropped and
+logged. Any other database error puts the batch back at the head of the
+queue for the next flush. The queue is also flushed when a chat socket
+closes and when the process exits; only a killed worker loses what it had
+queued, at most one flush interval.
+"""
+import asyncio
+import atexit
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction
+
+from .models import Message
+
+logger = logging.getLogger(__name__)
+
+
+@database_sync_to_async
+def _write(batch):
+    with transaction.atomic():
+        Message.objects.bulk_create(batch)
+
+
+@database_sync_to_async
+def _write_each(batch):
+    for message in batch:
+        try:
+            with transaction.atomic():
+                message.save(force_insert=True)
+        except IntegrityError:
+            logger.warning('Dropping chat message %s for conversation %s', message.uid, message.conversation_id)
+
+
+class MessageWriter:
+    def __init__(self):
+        self._queue = []
+        self._task = None
+        self.flushes = 0
+
+    @property
+    def batch_size(self):
+        return getattr(settings, 'CHAT_BATCH_SIZE', 100)
+
+    @property
+    def interval(self):
+        return getattr(settings, 'CHAT_FLUSH_INTERVAL', 0.05)
+
+    def __len__(self):
+        return len(self._queue)
+
+    async def add(self, message):
+        self._queue.append(message)
+        if len(self._queue) >= self.batch_size:
+            await self.flush()
+            return
+        self._schedule()
+
+    def _schedule(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = loop.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.interval)
+        await self.flush()
+
+    async def flush(self):
+        while self._queue:
+            batch, self._queue = self._queue[:self.batch_size], self._queue[self.batch_size:]
+            try:
+                await _write(batch)
+            except IntegrityError:
+                await _write_each(batch)
+            except DatabaseError:
+                logger.exception('Could not store %d chat messages, retrying', len(batch))
+                self._queue[:0] = batch
+                self._schedule()
+                return
+            self.flushes += 1
+
+
+writer = MessageWriter()
+
+
+@atexit.register
+def _flush_on_exit():
+    if len(writer):
+        async_to_sync(writer.flush)()
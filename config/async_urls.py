@@ -0,0 +1,14 @@
+"""
+URL configuration used when ASYNC_VIEWS is enabled.
+
+The async users views are listed first so they take over the paths (and
+names) of their sync counterparts, everything else is shared with
+config.urls.
+"""
+from django.urls import include, path
+
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('', include('users.async_urls')),
+] + sync_urlpatterns
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 
 # Load environment variables from .env file (optional)
 try:
@@ -39,6 +40,7 @@ ALLOWED_HOSTS = []
 # Application definition
 
 INSTALLED_APPS = [
+    'daphne',  # ASGI runserver, must come before staticfiles
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -53,28 +55,51 @@ INSTALLED_APPS = [
     'allauth.socialaccount',
     'allauth.socialaccount.providers.google',
     'bootstrap5',
+    'channels',
 
     # Local apps
     'users',
+    'chat',
 ]
 
 MIDDLEWARE = [
+    # First, so the queries of every other middleware are counted too.
+    'users.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'users.routers.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # AuthenticationMiddleware with request.user served from the cache.
+    'users.auth.CachedAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     # Add the account middleware:
     "allauth.account.middleware.AccountMiddleware",
 ]
 
-ROOT_URLCONF = 'config.urls'
+# Per-request query/template/size metrics and Server-Timing headers, see
+# users/metrics.py. Sampled by default, set 1.0 to measure every request.
+METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', 0.05))
+METRICS_SERVER_TIMING = True
+# /metrics answers 404 unless the scraper sends "Authorization: Bearer
+# <METRICS_TOKEN>" and/or connects from METRICS_ALLOWED_IPS; with neither set
+# it is closed. Both checks apply when both are set.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = [ip for ip in os.environ.get('METRICS_ALLOWED_IPS', '').split(',') if ip]
+# Directory shared by all worker processes of one server, see users/metrics.py.
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+METRICS_FLUSH_INTERVAL = 5.0
+
+# Serve the users views natively async under ASGI (daphne), see users.async_views.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '').lower() in ('1', 'true', 'yes')
+
+ROOT_URLCONF = 'config.async_urls' if ASYNC_VIEWS else 'config.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that reports render time to users.metrics.
+        'BACKEND': 'users.metrics.InstrumentedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -88,17 +113,126 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
+TESTING = 'test' in sys.argv[1:2]
+
+# DATABASE_URL selects the primary (e.g. PostgreSQL in production), with
+# persistent connections or psycopg's pool, see config/database.py.
+# DATABASE_REPLICA_URL adds a read replica.
+from .database import database_from_url  # noqa: E402
+
+DATABASE_URL = os.environ.get('DATABASE_URL', '')
+DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL', '')
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 600))
+
+if DATABASE_URL:
+    DATABASES = {
+        'default': database_from_url(DATABASE_URL, conn_max_age=DB_CONN_MAX_AGE),
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+
+# Reads of the users app go to DATABASE_REPLICAS, writes to 'default', see
+# users/routers.py. After a write the user's reads stay on the primary for
+# REPLICA_PIN_SECONDS.
+DATABASE_ROUTERS = ['users.routers.PrimaryReplicaRouter']
+DATABASE_REPLICAS = []
+REPLICA_PIN_SECONDS = 10
+
+if TESTING:
+    # A separate (empty) database, so routing tests can tell the two apart.
+    # Replicas are only enabled per test with override_settings.
+    DATABASES['replica'] = {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': BASE_DIR / 'db-replica.sqlite3',
+    }
+elif DATABASE_REPLICA_URL:
+    DATABASES['replica'] = database_from_url(DATABASE_REPLICA_URL, conn_max_age=DB_CONN_MAX_AGE)
+    DATABASE_REPLICAS = ['replica']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+
+REDIS_URL = os.environ.get('REDIS_URL', '')
+
+if REDIS_URL and not TESTING:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+        'sessions': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'session',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'speakmate',
+        },
+        'sessions': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'speakmate-sessions',
+        },
     }
-}
+
+# Sessions are read from their own cache alias (so clearing the default cache
+# does not log everyone out). 'cached_db' writes them through to the database
+# as well, 'cache' keeps them in the cache only.
+SESSION_ENGINE = 'django.contrib.sessions.backends.' + os.environ.get('SESSION_BACKEND', 'cached_db')
+SESSION_CACHE_ALIAS = 'sessions'
+# How long users.auth keeps request.user cached (saves invalidate it sooner).
+USER_CACHE_TIMEOUT = 600
+
+# Channels: Redis fan-out in production, in-process layer for development/tests
+# https://channels.readthedocs.io/en/latest/topics/channel_layers.html
+
+if REDIS_URL and not TESTING:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [REDIS_URL]},
+        }
+    }
+    PRESENCE_REDIS_URL = REDIS_URL
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        }
+    }
+    PRESENCE_REDIS_URL = ''
+
+# Presence changes are coalesced and broadcast once per interval (seconds).
+PRESENCE_FLUSH_INTERVAL = 0.5
+# Online entries in Redis expire PRESENCE_TTL seconds after the last
+# heartbeat, which every open connection sends once per interval.
+PRESENCE_TTL = 90
+PRESENCE_HEARTBEAT_INTERVAL = 30
+
+# Chat messages are persisted in batches of up to CHAT_BATCH_SIZE, at most
+# CHAT_FLUSH_INTERVAL seconds after they were delivered.
+CHAT_BATCH_SIZE = 100
+CHAT_FLUSH_INTERVAL = 0.05
+
+# Rendered profile fragments are invalidated on every profile change, the
+# timeout only bounds how long entries for inactive users linger.
+PROFILE_CACHE_TIMEOUT = 60 * 60 * 24
 
 
 # Password validation
@@ -142,6 +276,14 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Avatar thumbnails, generated by a thread pool after upload (users.avatars)
+AVATAR_THUMBNAIL_SIZES = (48, 150, 300)
+AVATAR_WORKERS = 2
+AVATAR_PROCESSING_EAGER = False
+AVATAR_MAX_UPLOAD_SIZE = 5 * 1024 * 1024
+AVATAR_MAX_DIMENSION = 4096
+AVATAR_MAX_PIXELS = 16 * 1024 * 1024
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -25,6 +25,8 @@ urlpatterns = [
     path('accounts/', include('allauth.urls')),
     path('', TemplateView.as_view(template_name='home.html'), name='home'),
     path('', include('users.urls')),
+    path('chat/', include('chat.urls')),
+    path('api/v1/', include('users.api_urls')),
 ]
 
 if settings.DEBUG:
@@ -12,11 +12,11 @@ BLUE='\033[0;34m'
 NC='\033[0m' # No Color
 
 echo -e "${BLUE}1. Запуск всіх тестів...${NC}"
-.venv/bin/python manage.py test users
+.venv/bin/python manage.py test users chat
 
 echo ""
 echo -e "${BLUE}2. Генерація звіту про покриття...${NC}"
-.venv/bin/coverage run --source='users' manage.py test users
+.venv/bin/coverage run --source='users,chat' manage.py test users chat
 
 echo ""
 echo -e "${BLUE}3. Відображення звіту про покриття:${NC}"
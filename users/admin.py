@@ -1,18 +1,109 @@
+import json
+
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, Language, Goal, Interest, UserLanguage
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from .catalogs import get_catalog, languages
+from .forms import CatalogChoiceField, CatalogMultipleChoiceField
+from .models import AvailabilitySlot, User, Language, Goal, Interest, UserLanguage
+from .search import is_supported, search_user_ids
+
+
+def estimated_count(queryset):
+    """The planner's row estimate for the queryset, None where unavailable."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+            # -1 until the table has been analyzed.
+            if row and row[0] >= 0:
+                return row[0]
+        sql, params = queryset.query.sql_with_params()
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Counts exactly up to ADMIN_EXACT_COUNT_LIMIT rows and estimates beyond
+    that, so a changelist over millions of users does not COUNT(*) them all
+    on every page. Where the database has no estimate the limit is used.
+    """
+
+    @cached_property
+    def count(self):
+        limit = getattr(settings, 'ADMIN_EXACT_COUNT_LIMIT', 10_000)
+        exact = self.object_list.order_by()[:limit + 1].count()
+        if exact <= limit:
+            return exact
+        return max(estimated_count(self.object_list.order_by()) or 0, limit)
+
 
-class UserLanguageInline(admin.TabularInline):
+class CatalogChoicesMixin:
+    """Build Language/Goal/Interest choices from the in-memory catalogs."""
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if get_catalog(db_field.related_model) is not None:
+            kwargs.setdefault('form_class', CatalogChoiceField)
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def formfield_for_manytomany(self, db_field, request, **kwargs):
+        if get_catalog(db_field.related_model) is not None:
+            kwargs.setdefault('form_class', CatalogMultipleChoiceField)
+        return super().formfield_for_manytomany(db_field, request, **kwargs)
+
+class UserLanguageInline(CatalogChoicesMixin, admin.TabularInline):
     model = UserLanguage
     extra = 1
 
-class CustomUserAdmin(UserAdmin):
+class AvailabilitySlotInline(admin.TabularInline):
+    model = AvailabilitySlot
+    extra = 0
+
+class CustomUserAdmin(CatalogChoicesMixin, UserAdmin):
     model = User
-    list_display = ['email', 'username', 'native_language', 'is_staff']
+    list_display = ['email', 'username', 'native_language_name', 'is_staff']
     fieldsets = UserAdmin.fieldsets + (
         ('Profile Info', {'fields': ('avatar', 'bio', 'birth_date', 'native_language', 'timezone', 'goals', 'interests')}),
     )
-    inlines = [UserLanguageInline]
+    inlines = [UserLanguageInline, AvailabilitySlotInline]
+    # Username/email prefixes (case-insensitive indexes, migration 0010) plus
+    # the full-text index over names and bio, instead of icontains scans.
+    search_fields = ['username', 'email', 'first_name', 'last_name']
+    search_help_text = 'Start of a username or email, or words from the name or bio.'
+    paginator = EstimatedCountPaginator
+    # The "N total" link next to filtered results costs another full count.
+    show_full_result_count = False
+
+    @admin.display(description='Native language', ordering='native_language')
+    def native_language_name(self, obj):
+        # From the in-memory catalog instead of a join or a query per row.
+        return languages.get(obj.native_language_id)
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term or not is_supported(queryset.db):
+            return super().get_search_results(request, queryset, search_term)
+        limit = getattr(settings, 'ADMIN_SEARCH_LIMIT', 1000)
+        # Deactivated accounts are still found here, unlike in the site search.
+        ids = [user_id for user_id, _rank in search_user_ids(term, limit=limit, active_only=False)]
+        # Names and bios come from the full-text index, usernames and emails
+        # still match by prefix like the default admin search.
+        return queryset.filter(
+            Q(pk__in=ids) | Q(username__istartswith=term) | Q(email__istartswith=term)
+        ), False
 
 admin.site.register(User, CustomUserAdmin)
 admin.site.register(Language)
@@ -0,0 +1,323 @@
+"""
+Versioned JSON API for the mobile client, mounted at /api/v1/.
+
+Payloads are built from values() rows, the cached request.user and the
+in-memory catalogs, never from per-row model instances, and encoded with
+orjson when it is installed. Every endpoint takes ``?fields=a,b`` to trim
+the top-level keys of each object (related rows that are not asked for are
+not queried either). Bodies of API_COMPRESS_MIN_LENGTH bytes and more are
+compressed with brotli when the package is installed and the client
+accepts it, with gzip otherwise.
+
+Writes use the session and CSRF token like the HTML forms do, and go
+through the model forms and model saves so the same signals (profile cache,
+partner index, profile stamp) fire. Replacing the whole language list
+(PUT /profile/languages/) is the exception: bulk.set_user_languages applies
+it in one transaction and does that invalidation once.
+"""
+import json
+import re
+from functools import lru_cache, wraps
+
+from django.core.exceptions import BadRequest
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, router, transaction
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+from django.views.decorators.http import require_http_methods
+
+from .bulk import UserLanguagesError, set_user_languages
+from .catalogs import goals, interests, languages
+from .forms import UserLanguageForm
+from .matching import partner_index
+from .models import User, UserLanguage
+from .search import is_supported, search_user_ids, search_users
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is an optional speedup
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+API_COMPRESS_MIN_LENGTH = 512
+MAX_PARTNERS = 50
+
+PROFILE_COLUMNS = (
+    'id', 'username', 'email', 'first_name', 'last_name', 'bio', 'birth_date', 'timezone', 'profile_updated_at',
+)
+PARTNER_COLUMNS = ('id', 'username', 'first_name', 'last_name', 'bio', 'timezone', 'native_language_id')
+CATALOGS = {
+    'languages': (languages, ('id', 'code', 'name')),
+    'goals': (goals, ('id', 'name')),
+    'interests': (interests, ('id', 'name')),
+}
+
+
+def encode(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+
+
+def _accepts(request, coding):
+    return re.search(rf'\b{coding}\b', request.META.get('HTTP_ACCEPT_ENCODING', '')) is not None
+
+
+def json_response(request, data, status=200, body=None):
+    body = encode(data) if body is None else body
+    response = HttpResponse(body, status=status, content_type='application/json')
+    patch_vary_headers(response, ('Accept-Encoding',))
+    if len(body) < API_COMPRESS_MIN_LENGTH:
+        return response
+    if brotli is not None and _accepts(request, 'br'):
+        response.content = brotli.compress(body, quality=4)
+        response['Content-Encoding'] = 'br'
+    elif _accepts(request, 'gzip'):
+        response.content = compress_string(body)
+        response['Content-Encoding'] = 'gzip'
+    response['Content-Length'] = str(len(response.content))
+    return response
+
+
+def error_response(request, status, message=None, errors=None):
+    data = {'error': message} if errors is None else {'errors': errors}
+    return json_response(request, data, status=status)
+
+
+def api_view(methods):
+    """Allowed methods, 401 instead of a login redirect, JSON for bad input."""
+    def decorator(view):
+        @require_http_methods(methods)
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                return error_response(request, 401, 'Authentication required.')
+            try:
+                return view(request, *args, **kwargs)
+            except BadRequest as exc:
+                return error_response(request, 400, str(exc))
+        return wrapper
+    return decorator
+
+
+def requested_fields(request):
+    fields = request.GET.get('fields')
+    if not fields:
+        return None
+    return {name.strip() for name in fields.split(',') if name.strip()}
+
+
+def select(row, fields):
+    if fields is None:
+        return row
+    return {key: value for key, value in row.items() if key in fields}
+
+
+def read_json(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        raise BadRequest('Request body is not valid JSON.')
+    if not isinstance(data, dict):
+        raise BadRequest('Request body must be a JSON object.')
+    return data
+
+
+def _language(language_id):
+    language = languages.get(language_id)
+    if language is None:
+        return None
+    return {'id': language.pk, 'code': language.code, 'name': language.name}
+
+
+def _avatar(name, thumbnails):
+    # The upload is only replaced by a metadata-free copy once it is processed.
+    if not name or not thumbnails:
+        return None
+    return {
+        'url': default_storage.url(name),
+        'thumbnails': {
+            size: {extension: default_storage.url(path) for extension, path in formats.items()}
+            for size, formats in (thumbnails or {}).items()
+        },
+    }
+
+
+@api_view(['GET'])
+def profile(request):
+    """The logged-in user's profile, the same data profile.html shows."""
+    fields = requested_fields(request)
+    user = request.user
+    data = {column: getattr(user, column) for column in PROFILE_COLUMNS}
+    data['native_language'] = _language(user.native_language_id)
+    data['avatar'] = _avatar(user.avatar.name, user.avatar_thumbnails)
+    # request.user is cached, only related rows that are asked for are read.
+    if fields is None or 'languages' in fields:
+        data['languages'] = [
+            {'id': pk, 'language': _language(language_id), 'proficiency': level}
+            for pk, language_id, level in UserLanguage.objects.filter(user_id=user.pk).order_by('pk').values_list(
+                'pk', 'language_id', 'proficiency',
+            )
+        ]
+    if fields is None or 'goals' in fields:
+        ids = User.goals.through.objects.filter(user_id=user.pk).values_list('goal_id', flat=True)
+        data['goals'] = [{'id': goal.pk, 'name': goal.name} for goal in map(goals.get, sorted(ids)) if goal]
+    if fields is None or 'interests' in fields:
+        ids = User.interests.through.objects.filter(user_id=user.pk).values_list('interest_id', flat=True)
+        data['interests'] = [
+            {'id': interest.pk, 'name': interest.name} for interest in map(interests.get, sorted(ids)) if interest
+        ]
+    return json_response(request, select(data, fields))
+
+
+@lru_cache(maxsize=64)
+def _catalog_body(kind, version, fields):
+    catalog, columns = CATALOGS[kind]
+    columns = [column for column in columns if fields is None or column in fields]
+    return encode([{column: getattr(obj, column) for column in columns} for obj in catalog.all()])
+
+
+@api_view(['GET'])
+def catalog(request, kind):
+    # Encoded once per catalog version (and field selection), not per request.
+    fields = requested_fields(request)
+    catalog_obj = CATALOGS[kind][0]
+    body = _catalog_body(kind, catalog_obj.version(), frozenset(fields) if fields else None)
+    return json_response(request, None, body=body)
+
+
+def _user_language(row):
+    pk, language_id, level = row
+    return {'id': pk, 'language': _language(language_id), 'proficiency': level}
+
+
+def _save_user_language(request, instance, data):
+    form = UserLanguageForm(data, instance=instance)
+    if not form.is_valid():
+        return error_response(request, 400, errors=form.errors.get_json_data())
+    user_language = form.save(commit=False)
+    user_language.user_id = request.user.pk
+    try:
+        with transaction.atomic():
+            user_language.save()
+    except IntegrityError:
+        return error_response(request, 400, errors={
+            'language': [{'message': 'Language already added.', 'code': 'unique'}],
+        })
+    status = 201 if instance is None else 200
+    row = (user_language.pk, user_language.language_id, user_language.proficiency)
+    return json_response(request, select(_user_language(row), requested_fields(request)), status=status)
+
+
+def _replace_user_languages(request):
+    """PUT: the submitted list becomes the user's languages, in one transaction."""
+    items = read_json(request).get('languages')
+    if not isinstance(items, list):
+        raise BadRequest('languages must be a list.')
+    levels = {}
+    for item in items:
+        try:
+            levels[int(item['language'])] = item['proficiency']
+        except (KeyError, TypeError, ValueError):
+            raise BadRequest('Each language needs a language id and a proficiency.')
+    try:
+        stats = set_user_languages(request.user.pk, levels)
+    except UserLanguagesError as exc:
+        raise BadRequest(str(exc))
+    return stats
+
+
+@api_view(['GET', 'POST', 'PUT'])
+def user_languages(request):
+    if request.method == 'POST':
+        return _save_user_language(request, None, read_json(request))
+    stats = _replace_user_languages(request) if request.method == 'PUT' else None
+    fields = requested_fields(request)
+    rows = UserLanguage.objects.filter(user_id=request.user.pk).order_by('pk').values_list(
+        'pk', 'language_id', 'proficiency',
+    )
+    data = [select(_user_language(row), fields) for row in rows]
+    return json_response(request, data if stats is None else {'languages': data, **stats})
+
+
+@api_view(['GET', 'PATCH', 'PUT', 'DELETE'])
+def user_language(request, pk):
+    instance = UserLanguage.objects.filter(pk=pk, user_id=request.user.pk).first()
+    if instance is None:
+        return error_response(request, 404, 'Not found.')
+    if request.method == 'DELETE':
+        instance.delete()
+        return HttpResponse(status=204)
+    if request.method == 'GET':
+        row = (instance.pk, instance.language_id, instance.proficiency)
+        return json_response(request, select(_user_language(row), requested_fields(request)))
+    data = {'language': instance.language_id, 'proficiency': instance.proficiency, **read_json(request)}
+    return _save_user_language(request, instance, data)
+
+
+def _partner_rows(user_ids, fields):
+    columns = [
+        column for column in PARTNER_COLUMNS
+        if fields is None or column in fields or (column == 'native_language_id' and 'native_language' in fields)
+    ]
+    if 'id' not in columns:
+        columns.insert(0, 'id')
+    rows = {row['id']: row for row in User.objects.filter(pk__in=user_ids).values(*columns)}
+    for row in rows.values():
+        if 'native_language_id' in row:
+            row['native_language'] = _language(row.pop('native_language_id'))
+    return rows
+
+
+def _limit(request, default=20):
+    try:
+        return max(1, min(int(request.GET.get('limit', default)), MAX_PARTNERS))
+    except ValueError:
+        raise BadRequest('limit must be an integer.')
+
+
+def _min_overlap(request):
+    try:
+        return max(0, int(request.GET.get('min_overlap', 0)))
+    except ValueError:
+        raise BadRequest('min_overlap must be an integer.')
+
+
+@api_view(['GET'])
+def partners(request):
+    """
+    Best ranked partners from the in-memory partner index, ``?min_overlap=``
+    keeps those available at the same time for that many minutes a week.
+    """
+    fields = requested_fields(request)
+    matches = partner_index.top_partners(request.user.pk, limit=_limit(request), min_overlap=_min_overlap(request))
+    rows = _partner_rows([match.user_id for match in matches], fields)
+    return json_response(request, [
+        select({**rows[match.user_id], 'score': round(match.score, 4)}, fields)
+        for match in matches if match.user_id in rows
+    ])
+
+
+@api_view(['GET'])
+def partner_search(request):
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return json_response(request, [])
+    fields = requested_fields(request)
+    limit = _limit(request)
+    if is_supported(router.db_for_read(User)):
+        ranked = search_user_ids(query, limit + 1)
+    else:
+        ranked = [(user.pk, 0.0) for user in search_users(query, limit + 1)]
+    ranked = [(user_id, rank) for user_id, rank in ranked if user_id != request.user.pk]
+    rows = _partner_rows([user_id for user_id, _rank in ranked[:limit]], fields)
+    return json_response(request, [
+        select({**rows[user_id], 'rank': round(rank, 4)}, fields)
+        for user_id, rank in ranked[:limit] if user_id in rows
+    ])
@@ -0,0 +1,13 @@
+from django.urls import path
+from . import api
+
+urlpatterns = [
+    path('profile/', api.profile, name='api_profile'),
+    path('profile/languages/', api.user_languages, name='api_user_languages'),
+    path('profile/languages/<int:pk>/', api.user_language, name='api_user_language'),
+    path('languages/', api.catalog, {'kind': 'languages'}, name='api_languages'),
+    path('goals/', api.catalog, {'kind': 'goals'}, name='api_goals'),
+    path('interests/', api.catalog, {'kind': 'interests'}, name='api_interests'),
+    path('partners/', api.partners, name='api_partners'),
+    path('partners/search/', api.partner_search, name='api_partner_search'),
+]
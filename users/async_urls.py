@@ -0,0 +1,8 @@
+from django.urls import path
+from . import async_views
+
+urlpatterns = [
+    path('profile/', async_views.profile_view, name='profile'),
+    path('profile/edit/', async_views.profile_edit, name='profile_edit'),
+    path('profile/add-language/', async_views.add_language, name='add_language'),
+]
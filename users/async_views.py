@@ -0,0 +1,111 @@
+"""
+Async counterparts of users.views, served when ASYNC_VIEWS is enabled.
+
+Reads go through the async ORM; form validation stays in a worker thread
+because building choices and initial M2M data are synchronous.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.core.exceptions import SynchronousOnlyOperation
+from django.shortcuts import redirect, render
+from django.utils.functional import SimpleLazyObject
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+
+from .avatars import schedule_avatar_processing
+from .cache import (
+    PROFILE_FRAGMENTS, not_modified_response, profile_cache_timeout, profile_fragment_keys, profile_validators,
+    set_profile_validators,
+)
+from .catalogs import catalog_version
+from .forms import UserLanguageForm, UserProfileForm
+from .metrics import registry
+from .models import User
+from .uploads import AvatarUploadHandler
+
+
+async def _request_user(request):
+    # Templates read request.user through the auth context processor, resolve
+    # it here so that does not fall back to a synchronous session lookup.
+    user = await request.auser()
+    request.user = user
+    return user
+
+
+@login_required
+async def profile_view(request):
+    user = await _request_user(request)
+    version = catalog_version()
+    etag, last_modified = profile_validators(request, user, version)
+    response = not_modified_response(request, etag, last_modified)
+    if response is not None:
+        return set_profile_validators(response, etag, last_modified)
+    cached = await cache.aget_many(profile_fragment_keys(user.pk, version))
+    context = {
+        'profile_user_id': user.pk,
+        'catalog_version': version,
+        'cache_timeout': profile_cache_timeout(),
+    }
+    if len(cached) == len(PROFILE_FRAGMENTS):
+        context['profile_user'] = SimpleLazyObject(lambda: User.objects.with_profile().get(pk=user.pk))
+        try:
+            response = render(request, 'users/profile.html', context)
+        except SynchronousOnlyOperation:
+            # A fragment was evicted between the check and the render.
+            pass
+        else:
+            registry.inc('cache_lookups_total', cache='profile', result='hit')
+            return set_profile_validators(response, etag, last_modified)
+    registry.inc('cache_lookups_total', cache='profile', result='miss')
+    context['profile_user'] = await User.objects.with_profile().aget(pk=user.pk)
+    return set_profile_validators(render(request, 'users/profile.html', context), etag, last_modified)
+
+
+@login_required
+@csrf_exempt
+async def profile_edit(request):
+    # Same as the sync view: the streaming upload handler must be installed
+    # before the body is parsed, so CSRF is checked on the inner view.
+    upload_handler = AvatarUploadHandler(request)
+    request.upload_handlers = [upload_handler]
+    return await _profile_edit(request, upload_handler)
+
+
+@csrf_protect
+async def _profile_edit(request, upload_handler):
+    user = await _request_user(request)
+    if request.method == 'POST':
+        form = await sync_to_async(UserProfileForm)(request.POST, request.FILES, instance=user)
+        for field, error in upload_handler.errors.items():
+            form.add_error(field, error)
+        if await sync_to_async(form.is_valid)():
+            avatar_changed = 'avatar' in form.changed_data
+            if avatar_changed:
+                user.avatar_thumbnails = {}
+            await user.asave()
+            await user.goals.aset(form.cleaned_data['goals'])
+            await user.interests.aset(form.cleaned_data['interests'])
+            if avatar_changed and user.avatar:
+                schedule_avatar_processing(user.pk)
+            messages.success(request, 'Your profile has been updated!')
+            return redirect('profile')
+    else:
+        form = await sync_to_async(UserProfileForm)(instance=user)
+    return await sync_to_async(render)(request, 'users/profile_edit.html', {'form': form})
+
+
+@login_required
+async def add_language(request):
+    user = await _request_user(request)
+    if request.method == 'POST':
+        form = UserLanguageForm(request.POST)
+        if await sync_to_async(form.is_valid)():
+            user_language = form.save(commit=False)
+            user_language.user = user
+            await user_language.asave()
+            messages.success(request, 'Language added!')
+            return redirect('profile')
+    else:
+        form = UserLanguageForm()
+    return await sync_to_async(render)(request, 'users/add_language.html', {'form': form})
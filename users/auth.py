@@ -0,0 +1,107 @@
+"""
+Cached request.user.
+
+CachedAuthenticationMiddleware replaces django.contrib.auth's
+AuthenticationMiddleware: the logged-in user is kept in the cache under its
+id and only read from users_user on a miss. With sessions served from the
+cache as well (SESSION_ENGINE), an authenticated request reaches the view
+without a database round-trip.
+
+The session auth hash is still compared with the cached user, so changing
+the password logs the other sessions out as before. Entries are dropped
+whenever the user is saved or deleted (users.signals) and after bulk
+updates that bypass signals.
+"""
+from functools import partial
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+from .routers import use_primary
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def user_cache_timeout():
+    return getattr(settings, 'USER_CACHE_TIMEOUT', 600)
+
+
+def invalidate_users(user_ids):
+    keys = [user_cache_key(user_id) for user_id in user_ids]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    # Again after commit, a concurrent miss may have cached the old row.
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _verified(user, session_hash):
+    return user is not None and constant_time_compare(session_hash, user.get_session_auth_hash())
+
+
+def get_user(request):
+    try:
+        user_id = request.session[SESSION_KEY]
+        backend_path = request.session[BACKEND_SESSION_KEY]
+        session_hash = request.session[HASH_SESSION_KEY]
+    except KeyError:
+        # Anonymous; auth.get_user returns AnonymousUser without a query.
+        return auth.get_user(request)
+    if backend_path in settings.AUTHENTICATION_BACKENDS:
+        user = cache.get(user_cache_key(user_id))
+        if _verified(user, session_hash):
+            return user
+    # A miss, or a hash that needs the full check (fallback secret keys,
+    # changed password), which may also flush the session. Read from the
+    # primary: the row is cached for USER_CACHE_TIMEOUT, a lagging replica
+    # would keep serving the old one that long.
+    with use_primary():
+        user = auth.get_user(request)
+    if user.is_authenticated:
+        cache.set(user_cache_key(user.pk), user, user_cache_timeout())
+    return user
+
+
+async def aget_user(request):
+    """See get_user()."""
+    user_id = await request.session.aget(SESSION_KEY)
+    backend_path = await request.session.aget(BACKEND_SESSION_KEY)
+    session_hash = await request.session.aget(HASH_SESSION_KEY)
+    if user_id is None or session_hash is None:
+        return await auth.aget_user(request)
+    if backend_path in settings.AUTHENTICATION_BACKENDS:
+        user = await cache.aget(user_cache_key(user_id))
+        if _verified(user, session_hash):
+            return user
+    with use_primary():
+        user = await auth.aget_user(request)
+    if user.is_authenticated:
+        await cache.aset(user_cache_key(user.pk), user, user_cache_timeout())
+    return user
+
+
+def _cached_user(request):
+    if not hasattr(request, '_cached_user'):
+        request._cached_user = get_user(request)
+    return request._cached_user
+
+
+async def _acached_user(request):
+    if not hasattr(request, '_acached_user'):
+        request._acached_user = await aget_user(request)
+    return request._acached_user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: _cached_user(request))
+        request.auser = partial(_acached_user, request)
@@ -0,0 +1,166 @@
+"""
+Weekly availability normalized to UTC.
+
+Users enter the hours they can practise as weekly slots in their own
+timezone (AvailabilitySlot). The index turns each user's slots into one
+bitset over the UTC week, bit ``i`` standing for the SLOT_MINUTES minutes
+that start ``i * SLOT_MINUTES`` minutes after Monday 00:00 UTC, and keeps
+the bitsets in a TagMatrix. How long two users are both free is the popcount
+of an AND, so one user is compared with any number of candidates in a single
+vectorized pass and no zoneinfo arithmetic happens at query time.
+
+Where a local slot falls in the UTC week depends on the offset of the user's
+timezone on that day, so every slot is placed with the offset of its next
+occurrence within the coming seven days. sync() looks those offsets up again
+once per timezone (at most every SYNC_INTERVAL seconds) and re-places only
+the slots of users whose timezone moved, from the slots kept in memory,
+when a DST switch enters the window or new tzdata is loaded.
+"""
+import threading
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from functools import lru_cache
+from time import monotonic
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError, available_timezones
+
+import numpy as np
+
+from .overlap import WORD_BITS, TagMatrix
+
+SLOT_MINUTES = 15
+DAY_MINUTES = 24 * 60
+WEEK_MINUTES = 7 * DAY_MINUTES
+WEEK_SLOTS = WEEK_MINUTES // SLOT_MINUTES
+WEEK_MASK = (1 << WEEK_SLOTS) - 1
+WEEK_WORDS = -(-WEEK_SLOTS // WORD_BITS)
+SYNC_INTERVAL = 300
+
+
+@lru_cache(maxsize=1)
+def timezone_names():
+    return frozenset(available_timezones())
+
+
+def week_offsets(tz_name, at=None):
+    """UTC offset in minutes of each local weekday (0 is Monday) over the coming week."""
+    try:
+        tz = ZoneInfo(tz_name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return (0,) * 7
+    today = (at or datetime.now(dt_timezone.utc)).astimezone(tz).date()
+    offsets = [0] * 7
+    for days in range(7):
+        day = today + timedelta(days=days)
+        # Noon is clear of the hours clocks are moved at.
+        offset = datetime.combine(day, time(12), tzinfo=tz).utcoffset()
+        offsets[day.weekday()] = int(offset.total_seconds() // 60)
+    return tuple(offsets)
+
+
+def minutes(value):
+    """Minutes since midnight of a time, 23:59 counting as the end of the day."""
+    total = value.hour * 60 + value.minute
+    return DAY_MINUTES if total == DAY_MINUTES - 1 else total
+
+
+def utc_mask(slots, offsets):
+    """Bitset of the UTC week covered by local ``(weekday, start, end)`` slots, in minutes."""
+    mask = 0
+    for weekday, start, end in slots:
+        if end <= start:
+            continue
+        utc_start = (weekday * DAY_MINUTES + start - offsets[weekday]) % WEEK_MINUTES
+        first = utc_start // SLOT_MINUTES
+        last = -(-(utc_start + end - start) // SLOT_MINUTES)
+        bits = ((1 << (last - first)) - 1) << first
+        # Slots running past Sunday midnight UTC continue on Monday.
+        mask |= (bits | bits >> WEEK_SLOTS) & WEEK_MASK
+    return mask
+
+
+def load_slots(queryset):
+    """{user id: [(weekday, start, end)]} from an AvailabilitySlot queryset."""
+    slots = defaultdict(list)
+    for user_id, weekday, start, end in queryset.values_list(
+        'user_id', 'weekday', 'start_time', 'end_time'
+    ).iterator():
+        slots[user_id].append((weekday, minutes(start), minutes(end)))
+    return slots
+
+
+class AvailabilityIndex:
+    """UTC availability bitsets of every user who entered slots."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._users = {}
+        self._by_timezone = defaultdict(set)
+        self._offsets = {}
+        self._masks = TagMatrix(words=WEEK_WORDS)
+        self._synced_at = monotonic()
+
+    def __len__(self):
+        return len(self._users)
+
+    def set_user(self, user_id, tz_name, slots):
+        slots = tuple(slots)
+        with self._lock:
+            self.remove_user(user_id)
+            if not slots:
+                return
+            offsets = self._offsets.get(tz_name)
+            if offsets is None:
+                offsets = self._offsets[tz_name] = week_offsets(tz_name)
+            self._users[user_id] = (tz_name, slots)
+            self._by_timezone[tz_name].add(user_id)
+            self._masks.set(user_id, utc_mask(slots, offsets))
+
+    def remove_user(self, user_id):
+        with self._lock:
+            entry = self._users.pop(user_id, None)
+            if entry is None:
+                return
+            members = self._by_timezone[entry[0]]
+            members.discard(user_id)
+            if not members:
+                del self._by_timezone[entry[0]]
+                del self._offsets[entry[0]]
+            self._masks.discard(user_id)
+
+    def mask(self, user_id):
+        return self._masks.get(user_id)
+
+    def shared_minutes(self, mask, user_ids):
+        """Minutes per week each of ``user_ids`` is free at the same time as ``mask``."""
+        with self._lock:
+            counts = self._masks.intersection_counts(mask, self._masks.rows_for(user_ids))
+        return counts * SLOT_MINUTES
+
+    def total_minutes(self, user_ids):
+        return self.shared_minutes(WEEK_MASK, user_ids)
+
+    def sync(self, at=None, force=False):
+        """
+        Re-place the slots of timezones whose offsets over the coming week
+        changed. Returns the number of users updated.
+        """
+        if not force and monotonic() - self._synced_at < SYNC_INTERVAL:
+            return 0
+        self._synced_at = monotonic()
+        updated = 0
+        with self._lock:
+            for tz_name in list(self._by_timezone):
+                offsets = week_offsets(tz_name, at)
+                if offsets == self._offsets[tz_name]:
+                    continue
+                self._offsets[tz_name] = offsets
+                for user_id in self._by_timezone[tz_name]:
+                    self._masks.set(user_id, utc_mask(self._users[user_id][1], offsets))
+                    updated += 1
+        return updated
+
+
+def overlap_ratio(shared, mine, theirs):
+    """Shared time as a share of the smaller of the two availabilities."""
+    smaller = np.minimum(mine, theirs)
+    return np.divide(shared, smaller, out=np.zeros(len(shared)), where=smaller > 0)
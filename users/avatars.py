@@ -0,0 +1,130 @@
+"""
+Avatar thumbnail pipeline.
+
+Uploads are stored as-is by the profile form; after the transaction commits
+the avatar is handed to a small thread pool which decodes it, applies the
+EXIF orientation, drops all metadata and writes square WebP and JPEG
+thumbnails named after the content hash of the original. The upload itself
+(which may carry GPS coordinates and camera details) is then replaced by a
+metadata-free re-encode and deleted. Nothing serves the raw upload, pages
+show a placeholder until the thumbnails exist.
+"""
+import hashlib
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from django.utils.timezone import now
+from PIL import Image, ImageOps
+
+from .auth import invalidate_users
+from .cache import invalidate_profile
+from .metrics import registry
+from .models import User
+from .routers import PRIMARY
+from .uploads import check_dimensions
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+_executor = None
+
+
+def thumbnail_sizes():
+    return tuple(getattr(settings, 'AVATAR_THUMBNAIL_SIZES', (48, 150, 300)))
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'AVATAR_WORKERS', 2),
+            thread_name_prefix='avatar',
+        )
+    return _executor
+
+
+def schedule_avatar_processing(user_id):
+    """Process the user's avatar off the request thread and return a Future."""
+    if getattr(settings, 'AVATAR_PROCESSING_EAGER', False):
+        future = Future()
+        future.set_result(_run(user_id))
+        return future
+    registry.inc('avatar_queue_depth')
+    return get_executor().submit(_run_queued, user_id)
+
+
+def _run_queued(user_id):
+    registry.dec('avatar_queue_depth')
+    return _run(user_id)
+
+
+def _run(user_id):
+    close_old_connections()
+    try:
+        return process_avatar(user_id)
+    except Exception:
+        logger.exception('Avatar processing failed for user %s', user_id)
+    finally:
+        close_old_connections()
+
+
+def process_avatar(user_id):
+    # Worker threads do not inherit the request's replica pin, and the
+    # replicas may not have the new avatar yet.
+    name = User.objects.using(PRIMARY).filter(pk=user_id).values_list('avatar', flat=True).first()
+    if not name:
+        return {}
+
+    with default_storage.open(name, 'rb') as source:
+        data = source.read()
+    digest = hashlib.sha256(data).hexdigest()[:20]
+
+    with Image.open(BytesIO(data)) as image:
+        if check_dimensions(*image.size):
+            logger.warning('Skipping oversized avatar for user %s', user_id)
+            return {}
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        extension = 'webp' if image.mode == 'RGBA' else 'jpg'
+        original = _store(image, f'avatars/clean/{digest}.{extension}', extension)
+        thumbnails = {}
+        for size in thumbnail_sizes():
+            thumbnail = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+            thumbnails[str(size)] = {
+                extension: _store(thumbnail, f'avatars/thumbs/{digest}-{size}.{extension}', extension)
+                for extension in THUMBNAIL_FORMATS
+            }
+
+    # A newer upload may have replaced the avatar while this one was running.
+    updated = User.objects.filter(pk=user_id, avatar=name).update(
+        avatar=original, avatar_thumbnails=thumbnails, profile_updated_at=now(),
+    )
+    if updated:
+        if original != name:
+            default_storage.delete(name)
+        invalidate_profile([user_id])
+        invalidate_users([user_id])
+    return thumbnails
+
+
+def _store(image, name, extension):
+    if default_storage.exists(name):
+        return name
+    image_format, options = THUMBNAIL_FORMATS[extension]
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    buffer = BytesIO()
+    # No exif/icc arguments are passed, so the thumbnails carry no metadata.
+    image.save(buffer, image_format, **options)
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
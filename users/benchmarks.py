@@ -0,0 +1,77 @@
+"""
+Helpers shared by the benchmark management commands.
+
+Benchmarks run against a throwaway test database (created the same way the
+test runner does) so they never touch development or production data.
+"""
+import json
+import math
+import time
+from contextlib import contextmanager
+
+from django.db import connections
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def summarize(latencies, elapsed):
+    """Throughput and latency percentiles (in milliseconds) for one run."""
+    count = len(latencies)
+    return {
+        'requests': count,
+        'seconds': round(elapsed, 4),
+        'throughput_rps': round(count / elapsed, 1) if elapsed else 0.0,
+        'mean_ms': round(sum(latencies) / count * 1000, 3) if count else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'max_ms': round(max(latencies, default=0) * 1000, 3),
+    }
+
+
+@contextmanager
+def timer():
+    """Yields a list that holds the elapsed seconds once the block exits."""
+    result = []
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result.append(time.perf_counter() - start)
+
+
+@contextmanager
+def benchmark_database(aliases=('default',), verbosity=0):
+    setup_test_environment()
+    old_names = []
+    for alias in aliases:
+        connection = connections[alias]
+        old_names.append((connection, connection.settings_dict['NAME']))
+        connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        for connection, old_name in reversed(old_names):
+            connection.creation.destroy_test_db(old_name, verbosity)
+        teardown_test_environment()
+
+
+def write_results(command, results, as_json):
+    if as_json:
+        command.stdout.write(json.dumps(results, indent=2, sort_keys=True))
+        return
+    for name, row in results.items():
+        if not isinstance(row, dict) or 'throughput_rps' not in row:
+            continue
+        command.stdout.write(
+            f"{name:<28} {row['throughput_rps']:>9.1f} req/s  "
+            f"p50 {row['p50_ms']:>8.2f} ms  p95 {row['p95_ms']:>8.2f} ms  "
+            f"p99 {row['p99_ms']:>8.2f} ms"
+        )
@@ -0,0 +1,367 @@
+"""
+Streaming CSV/JSONL import and export of users and the lookup tables.
+
+Rows are read and written through iterators and processed in fixed-size
+chunks: one transaction, one bulk_create/bulk_update for the users and one
+batched insert per through table (goals, interests, UserLanguage) per chunk,
+so memory stays flat no matter how large the file is.
+
+User rows::
+
+    username, email, first_name, last_name, bio, birth_date, timezone,
+    native_language   language code
+    learning          "en:B1|de:A2" in CSV, {"en": "B1", "de": "A2"} in JSONL
+    goals, interests  "Travel|Work" in CSV, ["Travel", "Work"] in JSONL
+
+Bulk operations do not send model signals, so the caches the signals would
+have refreshed (profile fragments, cached users, partner index, search index,
+catalogs) are invalidated explicitly here.
+"""
+import csv
+import json
+import sys
+from contextlib import contextmanager
+from datetime import date
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils.timezone import now
+
+from .auth import invalidate_users
+from .cache import invalidate_profile
+from .catalogs import get_catalog
+from .matching import partner_index
+from .models import Goal, Interest, Language, User, UserLanguage
+from .search import index_users
+from .signals import user_language_signals_muted
+
+DEFAULT_CHUNK_SIZE = 5000
+LIST_SEPARATOR = '|'
+USER_FIELDS = ['username', 'email', 'first_name', 'last_name', 'bio', 'birth_date', 'timezone']
+USER_COLUMNS = USER_FIELDS + ['native_language', 'learning', 'goals', 'interests']
+CATALOG_MODELS = {'languages': Language, 'goals': Goal, 'interests': Interest}
+CATALOG_COLUMNS = {Language: ['code', 'name'], Goal: ['name'], Interest: ['name']}
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return 'jsonl' if str(path).endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+@contextmanager
+def _open(path, mode):
+    if path == '-':
+        yield sys.stdin if 'r' in mode else sys.stdout
+        return
+    with open(path, mode, newline='', encoding='utf-8') as handle:
+        yield handle
+
+
+def read_rows(path, fmt=None):
+    """Yield one dict per CSV row / JSONL line."""
+    fmt = detect_format(path, fmt)
+    with _open(path, 'r') as handle:
+        if fmt == 'csv':
+            yield from csv.DictReader(handle)
+            return
+        for number, line in enumerate(handle, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as exc:
+                raise BulkImportError(f'Line {number}: invalid JSON ({exc.msg}).') from exc
+            if not isinstance(row, dict):
+                raise BulkImportError(f'Line {number}: expected a JSON object.')
+            yield row
+
+
+def write_rows(path, rows, columns, fmt=None):
+    fmt = detect_format(path, fmt)
+    count = 0
+    with _open(path, 'w') as handle:
+        if fmt == 'csv':
+            writer = csv.DictWriter(handle, fieldnames=columns)
+            writer.writeheader()
+        for row in rows:
+            if fmt == 'csv':
+                writer.writerow({key: _flatten(value) for key, value in row.items()})
+            else:
+                handle.write(json.dumps(row, ensure_ascii=False) + '\n')
+            count += 1
+    return count
+
+
+def _flatten(value):
+    if isinstance(value, dict):
+        return LIST_SEPARATOR.join(f'{key}:{item}' for key, item in value.items())
+    if isinstance(value, list):
+        return LIST_SEPARATOR.join(value)
+    return value
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _split(value):
+    if not value:
+        return []
+    if isinstance(value, list):
+        return value
+    return [item.strip() for item in str(value).split(LIST_SEPARATOR) if item.strip()]
+
+
+def _learning(value):
+    if isinstance(value, dict):
+        return value
+    return dict(item.split(':', 1) for item in _split(value))
+
+
+class BulkImportError(ValueError):
+    pass
+
+
+class UserLanguagesError(ValueError):
+    """A language list for set_user_languages names an unknown language or level."""
+
+
+class UserImporter:
+    """Import user rows chunk by chunk, see the module docstring for columns."""
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, update=False):
+        self.chunk_size = chunk_size
+        self.update = update
+        self.languages = dict(Language.objects.values_list('code', 'pk'))
+        self.goals = dict(Goal.objects.values_list('name', 'pk'))
+        self.interests = dict(Interest.objects.values_list('name', 'pk'))
+        self.levels = {code for code, _label in UserLanguage.PROFICIENCY_CHOICES}
+        # Imported accounts log in through password reset or social login.
+        self.password = make_password(None)
+        self.stats = {'created': 0, 'updated': 0, 'skipped': 0}
+
+    def run(self, rows):
+        try:
+            for chunk in chunked(rows, self.chunk_size):
+                self.import_chunk(chunk)
+        finally:
+            # Signals did not run, and the chunks committed before a failure
+            # stay imported: every process rebuilds its partner index.
+            partner_index.invalidate()
+        return self.stats
+
+    def _lookup(self, mapping, key, kind, row):
+        try:
+            return mapping[key]
+        except KeyError:
+            raise BulkImportError(f"Unknown {kind} '{key}' for user '{row.get('username')}'.")
+
+    def _build(self, row):
+        try:
+            birth_date = date.fromisoformat(row['birth_date']) if row.get('birth_date') else None
+        except ValueError:
+            raise BulkImportError(f"Invalid birth date '{row['birth_date']}' for user '{row.get('username')}'.")
+        try:
+            levels = _learning(row.get('learning'))
+        except ValueError:
+            raise BulkImportError(
+                f"Invalid learning '{row.get('learning')}' for user '{row.get('username')}', expected code:level."
+            )
+        user = User(
+            username=row['username'],
+            email=row.get('email') or '',
+            first_name=row.get('first_name') or '',
+            last_name=row.get('last_name') or '',
+            bio=row.get('bio') or '',
+            birth_date=birth_date,
+            timezone=row.get('timezone') or 'UTC',
+            native_language_id=(
+                self._lookup(self.languages, row['native_language'], 'language', row)
+                if row.get('native_language') else None
+            ),
+        )
+        learning = {}
+        for code, level in levels.items():
+            if level not in self.levels:
+                raise BulkImportError(f"Unknown proficiency '{level}' for user '{user.username}'.")
+            learning[self._lookup(self.languages, code, 'language', row)] = level
+        goals = [self._lookup(self.goals, name, 'goal', row) for name in _split(row.get('goals'))]
+        interests = [self._lookup(self.interests, name, 'interest', row) for name in _split(row.get('interests'))]
+        return user, learning, goals, interests
+
+    @transaction.atomic
+    def import_chunk(self, rows):
+        built = {}
+        for row in rows:
+            user, *related = self._build(row)
+            built[user.username] = (user, *related)
+        existing = dict(User.objects.filter(username__in=built).values_list('username', 'pk'))
+
+        new = [user for username, (user, *_rest) in built.items() if username not in existing]
+        for user in new:
+            user.password = self.password
+        User.objects.bulk_create(new, batch_size=self.chunk_size)
+        self.stats['created'] += len(new)
+
+        changed = []
+        if self.update and existing:
+            stamp = now()
+            for username, pk in existing.items():
+                built[username][0].pk = pk
+                built[username][0].profile_updated_at = stamp
+                changed.append(built[username][0])
+            User.objects.bulk_update(
+                changed, USER_FIELDS + ['native_language', 'profile_updated_at'], batch_size=self.chunk_size,
+            )
+            self.stats['updated'] += len(changed)
+        else:
+            self.stats['skipped'] += len(existing)
+            for username in existing:
+                del built[username]
+
+        if any(user.pk is None for user, *_rest in built.values()):
+            # Backends that cannot return ids from a bulk insert.
+            ids = dict(User.objects.filter(username__in=built).values_list('username', 'pk'))
+            for username, (user, *_rest) in built.items():
+                user.pk = ids[username]
+
+        user_ids = [user.pk for user, *_rest in built.values()]
+        changed_ids = [user.pk for user in changed]
+        if changed_ids:
+            UserLanguage.objects.filter(user_id__in=changed_ids).delete()
+            User.goals.through.objects.filter(user_id__in=changed_ids).delete()
+            User.interests.through.objects.filter(user_id__in=changed_ids).delete()
+        UserLanguage.objects.bulk_create([
+            UserLanguage(user_id=user.pk, language_id=language_id, proficiency=level)
+            for user, learning, _goals, _interests in built.values()
+            for language_id, level in learning.items()
+        ], batch_size=self.chunk_size)
+        User.goals.through.objects.bulk_create([
+            User.goals.through(user_id=user.pk, goal_id=goal_id)
+            for user, _learning, goals, _interests in built.values()
+            for goal_id in set(goals)
+        ], batch_size=self.chunk_size)
+        User.interests.through.objects.bulk_create([
+            User.interests.through(user_id=user.pk, interest_id=interest_id)
+            for user, _learning, _goals, interests in built.values()
+            for interest_id in set(interests)
+        ], batch_size=self.chunk_size)
+
+        index_users(user_ids)
+        if changed_ids:
+            invalidate_profile(changed_ids)
+            invalidate_users(changed_ids)
+
+
+def set_user_languages(user_id, levels):
+    """
+    Make the user's learning languages exactly ``levels`` ({language_id:
+    proficiency}): one diff against the stored rows, then at most one
+    bulk_create, bulk_update and delete in a single transaction, and the
+    caches invalidated once instead of once per row.
+    """
+    valid = {code for code, _label in UserLanguage.PROFICIENCY_CHOICES}
+    for language_id, level in levels.items():
+        if level not in valid:
+            raise UserLanguagesError(f"Unknown proficiency '{level}'.")
+        if get_catalog(Language).get(language_id) is None:
+            raise UserLanguagesError(f"Unknown language '{language_id}'.")
+
+    with transaction.atomic():
+        existing = {row.language_id: row for row in UserLanguage.objects.select_for_update().filter(user_id=user_id)}
+        new = [
+            UserLanguage(user_id=user_id, language_id=language_id, proficiency=level)
+            for language_id, level in levels.items() if language_id not in existing
+        ]
+        changed = []
+        for language_id, row in existing.items():
+            if language_id in levels and row.proficiency != levels[language_id]:
+                row.proficiency = levels[language_id]
+                changed.append(row)
+        removed = [row.pk for language_id, row in existing.items() if language_id not in levels]
+
+        UserLanguage.objects.bulk_create(new)
+        if changed:
+            UserLanguage.objects.bulk_update(changed, ['proficiency'])
+        if removed:
+            # post_delete would run a round of invalidation per row.
+            with user_language_signals_muted():
+                UserLanguage.objects.filter(pk__in=removed).delete()
+        stats = {'created': len(new), 'updated': len(changed), 'deleted': len(removed)}
+        if any(stats.values()):
+            User.objects.filter(pk=user_id).update(profile_updated_at=now())
+            invalidate_profile([user_id])
+            invalidate_users([user_id])
+            transaction.on_commit(lambda: partner_index.users_changed([user_id]))
+    return stats
+
+
+def export_users(chunk_size=DEFAULT_CHUNK_SIZE):
+    languages = dict(Language.objects.values_list('pk', 'code'))
+    goals = dict(Goal.objects.values_list('pk', 'name'))
+    interests = dict(Interest.objects.values_list('pk', 'name'))
+    # Relations are read per chunk straight from the through tables instead
+    # of prefetch_related, which would join the lookup tables every time.
+    queryset = User.objects.order_by('pk').values_list('pk', *USER_FIELDS, 'native_language_id')
+    last_pk = 0
+    while True:
+        chunk = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            return
+        ids = [row[0] for row in chunk]
+        learning, user_goals, user_interests = {}, {}, {}
+        for user_id, language_id, level in UserLanguage.objects.filter(user_id__in=ids).order_by('pk').values_list(
+            'user_id', 'language_id', 'proficiency'
+        ):
+            learning.setdefault(user_id, {})[languages[language_id]] = level
+        for user_id, goal_id in User.goals.through.objects.filter(user_id__in=ids).values_list('user_id', 'goal_id'):
+            user_goals.setdefault(user_id, []).append(goals[goal_id])
+        for user_id, interest_id in User.interests.through.objects.filter(user_id__in=ids).values_list(
+            'user_id', 'interest_id'
+        ):
+            user_interests.setdefault(user_id, []).append(interests[interest_id])
+        for pk, *values, native_id in chunk:
+            row = dict(zip(USER_FIELDS, values))
+            row['birth_date'] = row['birth_date'].isoformat() if row['birth_date'] else ''
+            row['native_language'] = languages.get(native_id, '')
+            row['learning'] = learning.get(pk, {})
+            row['goals'] = sorted(user_goals.get(pk, []))
+            row['interests'] = sorted(user_interests.get(pk, []))
+            yield row
+        last_pk = ids[-1]
+
+
+def import_catalog(model, rows, update=False):
+    """Create missing Language (by code) / Goal / Interest (by name) rows."""
+    key = CATALOG_COLUMNS[model][0]
+    existing = {getattr(obj, key): obj for obj in model.objects.all()}
+    new, changed = [], []
+    for row in rows:
+        value = row[key]
+        if value in existing:
+            obj = existing[value]
+            if update and model is Language and obj.name != row['name']:
+                obj.name = row['name']
+                changed.append(obj)
+            continue
+        obj = model(**{column: row[column] for column in CATALOG_COLUMNS[model]})
+        existing[value] = obj
+        new.append(obj)
+    with transaction.atomic():
+        model.objects.bulk_create(new)
+        if changed:
+            model.objects.bulk_update(changed, ['name'])
+        catalog = get_catalog(model)
+        catalog.invalidate()
+        transaction.on_commit(catalog.invalidate)
+    return {'created': len(new), 'updated': len(changed)}
+
+
+def export_catalog(model):
+    columns = CATALOG_COLUMNS[model]
+    for values in model.objects.order_by('pk').values_list(*columns).iterator():
+        yield dict(zip(columns, values))
@@ -0,0 +1,74 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .catalogs import catalog_version
+
+# Names of the {% cache %} blocks in users/profile.html.
+PROFILE_FRAGMENTS = (
+    'profile_card',
+    'profile_about',
+    'profile_languages',
+    'profile_goals',
+    'profile_interests',
+)
+
+
+def profile_cache_timeout():
+    return getattr(settings, 'PROFILE_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def profile_fragment_keys(user_id, version=None):
+    # Fragments render catalog names too, so a catalog edit moves every
+    # profile to fresh keys instead of deleting them one by one.
+    vary_on = [user_id, version or catalog_version()]
+    return [make_template_fragment_key(name, vary_on) for name in PROFILE_FRAGMENTS]
+
+
+def invalidate_profile(user_ids):
+    version = catalog_version()
+    keys = [key for user_id in user_ids for key in profile_fragment_keys(user_id, version)]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    # Delete again once the write is visible to other connections, otherwise a
+    # concurrent render could cache the pre-commit state in between.
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def profile_validators(request, user, version=None):
+    """
+    (etag, last_modified) of the user's own profile page, or (None, None)
+    when it must be rendered anyway because flash messages are waiting.
+    """
+    if len(get_messages(request)):
+        return None, None
+    # The page embeds a CSRF token and catalog names, so both are part of it.
+    parts = [user.pk, user.profile_updated_at.isoformat(), version or catalog_version(),
+             request.META.get('CSRF_COOKIE', '')]
+    digest = hashlib.md5(':'.join(map(str, parts)).encode(), usedforsecurity=False).hexdigest()
+    etag = f'"{digest}"'
+    # HTTP dates have whole seconds.
+    return etag, int(user.profile_updated_at.timestamp())
+
+
+def not_modified_response(request, etag, last_modified):
+    """A 304 when the client's copy is current, otherwise None."""
+    if etag is None:
+        return None
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def set_profile_validators(response, etag, last_modified):
+    if etag is not None and response.status_code in (200, 304):
+        response.headers.setdefault('ETag', etag)
+        response.headers.setdefault('Last-Modified', http_date(last_modified))
+    # Browsers keep the page but ask every time, a 304 answers the question.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
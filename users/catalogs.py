@@ -0,0 +1,109 @@
+"""
+Process-local copies of the Language, Goal and Interest lookup tables.
+
+Each catalog keeps its rows in memory together with a version token. The
+token is shared through the Django cache so that an edit made in one worker
+(e.g. in the admin) replaces the token for all of them, every worker notices
+the new token within CATALOG_VERSION_CHECK_INTERVAL seconds and reloads.
+A pk that is not in the copy triggers a reload too, but at most once per
+interval, so lookups of a pk that does not exist do not reload every time.
+"""
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .metrics import registry
+from .models import Goal, Interest, Language
+
+
+def _new_token():
+    return uuid.uuid4().hex
+
+
+class Catalog:
+    def __init__(self, model):
+        self.model = model
+        self.version_key = f'catalog:{model._meta.label_lower}:version'
+        self.metric_name = f'catalog_{model._meta.model_name}'
+        self._lock = threading.Lock()
+        self._token = None
+        self._shared_token = None
+        self._checked_at = 0.0
+        self._miss_loaded_at = None
+        self._items = ()
+        self._by_pk = {}
+
+    @staticmethod
+    def check_interval():
+        return getattr(settings, 'CATALOG_VERSION_CHECK_INTERVAL', 2.0)
+
+    def version(self):
+        """The shared version token, re-read at most once per check interval."""
+        now = time.monotonic()
+        if self._shared_token is None or now - self._checked_at >= self.check_interval():
+            token = cache.get(self.version_key)
+            if token is None:
+                cache.add(self.version_key, _new_token(), timeout=None)
+                token = cache.get(self.version_key)
+            self._shared_token = token
+            self._checked_at = now
+        return self._shared_token
+
+    def all(self):
+        self._sync()
+        return self._items
+
+    def get(self, pk):
+        self._sync()
+        obj = self._by_pk.get(pk)
+        if obj is None and pk is not None:
+            # Created by another worker that has not bumped our copy yet.
+            registry.inc('cache_lookups_total', cache=self.metric_name, result='miss')
+            now = time.monotonic()
+            if self._miss_loaded_at is None or now - self._miss_loaded_at >= self.check_interval():
+                self._miss_loaded_at = now
+                self._load(self.version())
+                obj = self._by_pk.get(pk)
+        return obj
+
+    def invalidate(self):
+        token = _new_token()
+        cache.set(self.version_key, token, timeout=None)
+        with self._lock:
+            self._shared_token = token
+            self._checked_at = time.monotonic()
+            self._token = None
+
+    def _sync(self):
+        token = self.version()
+        if token != self._token:
+            registry.inc('cache_lookups_total', cache=self.metric_name, result='miss')
+            self._load(token)
+        else:
+            registry.inc('cache_lookups_total', cache=self.metric_name, result='hit')
+
+    def _load(self, token):
+        with self._lock:
+            items = tuple(self.model._default_manager.order_by('pk'))
+            self._items = items
+            self._by_pk = {obj.pk: obj for obj in items}
+            self._token = token
+
+
+languages = Catalog(Language)
+goals = Catalog(Goal)
+interests = Catalog(Interest)
+
+CATALOGS = {catalog.model: catalog for catalog in (languages, goals, interests)}
+
+
+def get_catalog(model):
+    return CATALOGS.get(model)
+
+
+def catalog_version():
+    """One token covering all catalogs, for keys of anything that renders them."""
+    return '-'.join(catalog.version()[:8] for catalog in CATALOGS.values())
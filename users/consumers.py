@@ -0,0 +1,99 @@
+import asyncio
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .matching import partner_index
+from .metrics import registry
+from .presence import batcher, get_presence_store, heartbeat_interval, language_group
+
+
+@database_sync_to_async
+def _partners_speaking(user_id, language_id):
+    return {
+        candidate_id for candidate_id in partner_index.candidates(user_id)
+        if (profile := partner_index.get_profile(candidate_id)) and profile.native_id == language_id
+    }
+
+
+class PresenceConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Tracks the connected user as online and streams "partners online now"
+    for the languages the client subscribes to:
+
+        -> {"action": "subscribe", "language": 3}
+        <- {"type": "snapshot", "language": 3, "online": [12, 40]}
+        <- {"type": "update", "language": 3, "online": [51], "offline": [12]}
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+        self.user_id = user.pk
+        self.native_id = user.native_language_id
+        self.partners = {}
+        await self.accept()
+        registry.inc('websocket_connections', consumer='presence')
+        if await get_presence_store().connect(self.user_id, self.native_id):
+            batcher.mark(self.native_id, self.user_id, True)
+        self.heartbeat_task = asyncio.create_task(self._heartbeat())
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(heartbeat_interval())
+            await get_presence_store().heartbeat(self.user_id, self.native_id)
+
+    async def disconnect(self, code):
+        if not hasattr(self, 'user_id'):
+            return
+        registry.dec('websocket_connections', consumer='presence')
+        if hasattr(self, 'heartbeat_task'):
+            self.heartbeat_task.cancel()
+        for language_id in list(self.partners):
+            await self.channel_layer.group_discard(language_group(language_id), self.channel_name)
+        if await get_presence_store().disconnect(self.user_id, self.native_id):
+            batcher.mark(self.native_id, self.user_id, False)
+
+    async def receive_json(self, content, **kwargs):
+        if not isinstance(content, dict):
+            await self.send_json({'type': 'error', 'message': 'Send a JSON object.'})
+            return
+        action = content.get('action')
+        try:
+            language_id = int(content.get('language'))
+        except (TypeError, ValueError):
+            await self.send_json({'type': 'error', 'message': 'language must be an id'})
+            return
+        if action == 'subscribe':
+            await self.subscribe(language_id)
+        elif action == 'unsubscribe':
+            self.partners.pop(language_id, None)
+            await self.channel_layer.group_discard(language_group(language_id), self.channel_name)
+        else:
+            await self.send_json({'type': 'error', 'message': 'unknown action'})
+
+    async def subscribe(self, language_id):
+        self.partners[language_id] = await _partners_speaking(self.user_id, language_id)
+        await self.channel_layer.group_add(language_group(language_id), self.channel_name)
+        online = await get_presence_store().online_for_language(language_id)
+        await self.send_json({
+            'type': 'snapshot',
+            'language': language_id,
+            'online': sorted(online & self.partners[language_id]),
+        })
+
+    async def presence_update(self, event):
+        partners = self.partners.get(event['language'])
+        if partners is None:
+            return
+        online = [pk for pk in event['online'] if pk in partners]
+        offline = [pk for pk in event['offline'] if pk in partners]
+        if online or offline:
+            await self.send_json({
+                'type': 'update',
+                'language': event['language'],
+                'online': online,
+                'offline': offline,
+            })
@@ -0,0 +1,78 @@
+"""
+Filtered partner directory with keyset pagination.
+
+Pages are cut by user id (``?after=<id>``) instead of OFFSET, so the
+database seeks straight to the cursor through the (native_language, id)
+index rather than reading and discarding every earlier row; page 1000 costs
+the same as page 1. Multi-valued filters are EXISTS subqueries so a user
+never appears twice and the id ordering stays a plain range scan.
+"""
+import time
+from functools import lru_cache
+from zoneinfo import available_timezones
+
+from django.db.models import Exists, OuterRef
+
+from .matching import PROFICIENCY_LEVELS, utc_offset_minutes
+from .models import User, UserLanguage
+
+DIRECTORY_PAGE_SIZE = 20
+
+
+def timezone_offset_choices():
+    # Recomputed every hour, the set of offsets in use moves with DST.
+    return _offset_choices(int(time.time() // 3600))
+
+
+@lru_cache(maxsize=1)
+def _offset_choices(hour):
+    offsets = sorted({utc_offset_minutes(name) for name in available_timezones()})
+    return [
+        (offset, f"UTC{'+' if offset >= 0 else '-'}{abs(offset) // 60:02d}:{abs(offset) % 60:02d}")
+        for offset in offsets
+    ]
+
+
+def timezones_with_offset(offset, using='default'):
+    names = User.objects.using(using).order_by().values_list('timezone', flat=True).distinct()
+    return [name for name in names if utc_offset_minutes(name) == offset]
+
+
+def proficiency_codes(low=None, high=None):
+    low = PROFICIENCY_LEVELS[low] if low else 0
+    high = PROFICIENCY_LEVELS[high] if high else len(PROFICIENCY_LEVELS) - 1
+    return [code for code, level in PROFICIENCY_LEVELS.items() if low <= level <= high]
+
+
+def filter_directory(queryset, filters):
+    """Apply the cleaned data of a PartnerDirectoryForm to a User queryset."""
+    if filters.get('native_language'):
+        queryset = queryset.filter(native_language=filters['native_language'])
+    if filters.get('learning_language'):
+        queryset = queryset.filter(Exists(UserLanguage.objects.filter(
+            user=OuterRef('pk'),
+            language=filters['learning_language'],
+            proficiency__in=proficiency_codes(filters.get('min_proficiency'), filters.get('max_proficiency')),
+        )))
+    if filters.get('goals'):
+        queryset = queryset.filter(Exists(User.goals.through.objects.filter(
+            user=OuterRef('pk'), goal__in=filters['goals'],
+        )))
+    if filters.get('interests'):
+        queryset = queryset.filter(Exists(User.interests.through.objects.filter(
+            user=OuterRef('pk'), interest__in=filters['interests'],
+        )))
+    if filters.get('utc_offset') is not None:
+        queryset = queryset.filter(timezone__in=timezones_with_offset(filters['utc_offset'], queryset.db))
+    return queryset
+
+
+def keyset_page(queryset, after=None, size=DIRECTORY_PAGE_SIZE):
+    """One page ordered by id and the cursor of the next one (None on the last page)."""
+    queryset = queryset.order_by('id')
+    if after is not None:
+        queryset = queryset.filter(id__gt=after)
+    rows = list(queryset[:size + 1])
+    if len(rows) > size:
+        return rows[:size], rows[size - 1].pk
+    return rows, None
@@ -1,7 +1,91 @@
 from django import forms
-from .models import User, UserLanguage, Language
+from django.core.exceptions import ValidationError
+from django.forms.models import ModelChoiceIterator, inlineformset_factory
+from .catalogs import get_catalog
+from .directory import timezone_offset_choices
+from .uploads import check_dimensions, check_size
+from .availability import timezone_names
+from .models import AvailabilitySlot, User, UserLanguage, Language, Goal, Interest
 
-class UserProfileForm(forms.ModelForm):
+
+class CatalogChoiceIterator(ModelChoiceIterator):
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for obj in self.field.catalog.all():
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(self.field.catalog.all()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.field.catalog.all())
+
+
+class CatalogChoiceMixin:
+    """Choices and validation served from the in-memory catalog of the queryset's model."""
+
+    iterator = CatalogChoiceIterator
+
+    def __init__(self, queryset, **kwargs):
+        self.catalog = get_catalog(queryset.model)
+        super().__init__(queryset, **kwargs)
+
+    def _lookup(self, value):
+        if isinstance(value, self.queryset.model):
+            value = value.pk
+        try:
+            return self.catalog.get(int(value))
+        except (TypeError, ValueError):
+            return None
+
+
+class CatalogChoiceField(CatalogChoiceMixin, forms.ModelChoiceField):
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        obj = self._lookup(value)
+        if obj is None:
+            raise ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+        return obj
+
+
+class CatalogMultipleChoiceField(CatalogChoiceMixin, forms.ModelMultipleChoiceField):
+    def _check_values(self, value):
+        try:
+            value = frozenset(value)
+        except TypeError:
+            raise ValidationError(self.error_messages['invalid_list'], code='invalid_list')
+        objects = []
+        for pk in value:
+            obj = self._lookup(pk)
+            if obj is None:
+                raise ValidationError(
+                    self.error_messages['invalid_choice'],
+                    code='invalid_choice',
+                    params={'value': pk},
+                )
+            objects.append(obj)
+        return objects
+
+
+class CatalogModelForm(forms.ModelForm):
+    def _get_validation_exclusions(self):
+        # The catalog field has already resolved the instance, skip the
+        # model-level ForeignKey existence query for it.
+        exclude = super()._get_validation_exclusions()
+        exclude.update(
+            name for name, field in self.fields.items()
+            if isinstance(field, CatalogChoiceField)
+        )
+        return exclude
+
+
+class UserProfileForm(CatalogModelForm):
     class Meta:
         model = User
         fields = ['avatar', 'first_name', 'last_name', 'bio', 'birth_date', 'native_language', 'timezone', 'goals', 'interests']
@@ -10,8 +94,86 @@ class UserProfileForm(forms.ModelForm):
             'goals': forms.CheckboxSelectMultiple(),
             'interests': forms.CheckboxSelectMultiple(),
         }
+        field_classes = {
+            'native_language': CatalogChoiceField,
+            'goals': CatalogMultipleChoiceField,
+            'interests': CatalogMultipleChoiceField,
+        }
+
+    def clean_avatar(self):
+        avatar = self.cleaned_data.get('avatar')
+        image = getattr(avatar, 'image', None)
+        if 'avatar' in self.changed_data and avatar:
+            error = check_size(avatar.size) or (image and check_dimensions(*image.size))
+            if error:
+                raise ValidationError(error)
+        return avatar
+
+    def clean_timezone(self):
+        # Availability is placed on the UTC week through this name.
+        timezone = self.cleaned_data['timezone']
+        if timezone not in timezone_names():
+            raise ValidationError('Unknown timezone, use a name like Europe/Kyiv.')
+        return timezone
 
-class UserLanguageForm(forms.ModelForm):
+class UserLanguageForm(CatalogModelForm):
     class Meta:
         model = UserLanguage
         fields = ['language', 'proficiency']
+        field_classes = {
+            'language': CatalogChoiceField,
+        }
+
+class UserLanguagesForm(forms.Form):
+    """Every catalog language with a level, or blank when not learning it."""
+
+    LEVEL_CHOICES = [('', 'Not learning')] + UserLanguage.PROFICIENCY_CHOICES
+
+    def __init__(self, *args, levels=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        levels = levels or {}
+        for language in get_catalog(Language).all():
+            self.fields[f'language_{language.pk}'] = forms.ChoiceField(
+                choices=self.LEVEL_CHOICES, required=False, label=language.name,
+                initial=levels.get(language.pk, ''),
+            )
+
+    def levels(self):
+        return {
+            int(name.removeprefix('language_')): level
+            for name, level in self.cleaned_data.items() if level
+        }
+
+AvailabilityFormSet = inlineformset_factory(
+    User,
+    AvailabilitySlot,
+    fields=['weekday', 'start_time', 'end_time'],
+    widgets={
+        'start_time': forms.TimeInput(attrs={'type': 'time'}),
+        'end_time': forms.TimeInput(attrs={'type': 'time'}),
+    },
+    extra=1,
+)
+
+class PartnerDirectoryForm(forms.Form):
+    PROFICIENCY_CHOICES = [('', 'Any')] + UserLanguage.PROFICIENCY_CHOICES
+
+    native_language = CatalogChoiceField(Language.objects.all(), required=False, empty_label='Any')
+    learning_language = CatalogChoiceField(Language.objects.all(), required=False, empty_label='Any')
+    min_proficiency = forms.ChoiceField(choices=PROFICIENCY_CHOICES, required=False)
+    max_proficiency = forms.ChoiceField(choices=PROFICIENCY_CHOICES, required=False)
+    goals = CatalogMultipleChoiceField(Goal.objects.all(), required=False, widget=forms.CheckboxSelectMultiple())
+    interests = CatalogMultipleChoiceField(Interest.objects.all(), required=False, widget=forms.CheckboxSelectMultiple())
+    utc_offset = forms.TypedChoiceField(coerce=int, empty_value=None, required=False, label='Timezone offset')
+    after = forms.IntegerField(required=False, min_value=0, widget=forms.HiddenInput())
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['utc_offset'].choices = [('', 'Any')] + timezone_offset_choices()
+
+    def clean(self):
+        cleaned_data = super().clean()
+        low, high = cleaned_data.get('min_proficiency'), cleaned_data.get('max_proficiency')
+        if low and high and low > high:
+            self.add_error('max_proficiency', 'Maximum proficiency must not be below the minimum.')
+        return cleaned_data
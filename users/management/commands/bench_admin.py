@@ -0,0 +1,87 @@
+import json
+import random
+import time
+
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from users.benchmarks import benchmark_database, summarize, timer, write_results
+from users.matching import partner_index
+from users.models import User
+from users.seeding import BIO_WORDS, seed_users
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the User admin (changelist pages, filtered and searched '
+        'changelists, change form, user autocomplete) on seeded populations '
+        'of each --sizes. Latency and queries per page should stay roughly '
+        'flat as the population grows.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+        parser.add_argument('--requests', type=int, default=50, help='Requests per page.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', action='store_true', help='Print results as JSON.')
+
+    def handle(self, *args, **options):
+        report = {}
+        for size in options['sizes']:
+            with benchmark_database():
+                cache.clear()
+                partner_index.clear()
+                report[str(size)] = self._run_size(size, options['requests'], options['seed'])
+            partner_index.clear()
+            if not options['json']:
+                self.stdout.write(f'-- {size} users')
+                write_results(self, report[str(size)], False)
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+
+    def _run_size(self, size, requests, seed):
+        results = {}
+        with timer() as elapsed:
+            seed_users(size, seed=seed, prefix='bench')
+        results['seed'] = {'seconds': round(elapsed[0], 2)}
+
+        admin_user = User.objects.create_superuser('bench-admin', 'bench-admin@example.com', 'bench-admin')
+        client = Client()
+        client.force_login(admin_user)
+        rng = random.Random(seed)
+        ids = list(User.objects.order_by('pk').values_list('pk', flat=True)[:1000])
+
+        def run(name, make_url):
+            latencies, queries = [], 0
+            start = time.perf_counter()
+            for i in range(requests):
+                with CaptureQueriesContext(connection) as context:
+                    request_start = time.perf_counter()
+                    response = client.get(make_url(i))
+                    latencies.append(time.perf_counter() - request_start)
+                assert response.status_code == 200, (name, response.status_code)
+                queries += len(context.captured_queries)
+            results[name] = summarize(latencies, time.perf_counter() - start)
+            results[name]['queries_per_request'] = round(queries / requests, 2)
+
+        changelist = reverse('admin:users_user_changelist')
+        run('changelist', lambda i: changelist)
+        # Past the last page the admin redirects, small populations get their last page.
+        per_page = admin.site._registry[User].list_per_page
+        page = min(5, -(-User.objects.count() // per_page))
+        run(f'changelist_page_{page}', lambda i: f'{changelist}?p={page}')
+        run('changelist_filtered', lambda i: f'{changelist}?is_staff__exact=0')
+        run('changelist_search', lambda i: f'{changelist}?q={BIO_WORDS[i % len(BIO_WORDS)]}')
+        run('changelist_search_email', lambda i: f'{changelist}?q=bench{rng.randrange(size)}@example.com')
+        run('change_form', lambda i: reverse('admin:users_user_change', args=[rng.choice(ids)]))
+        autocomplete = reverse('admin:autocomplete')
+        run('user_autocomplete', lambda i: (
+            f'{autocomplete}?app_label=chat&model_name=message&field_name=sender'
+            f'&term={BIO_WORDS[i % len(BIO_WORDS)][:3]}'
+        ))
+        return results
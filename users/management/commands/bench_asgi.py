@@ -0,0 +1,120 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client, override_settings
+from django.urls import clear_url_caches, reverse
+
+from users.benchmarks import benchmark_database, summarize, write_results
+from users.models import Goal, Interest, Language, User, UserLanguage
+
+SCENARIOS = {
+    'wsgi_sync_views': ('wsgi', 'config.urls'),
+    'asgi_sync_views': ('asgi', 'config.urls'),
+    'asgi_async_views': ('asgi', 'config.async_urls'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare throughput and tail latency of the users views served through '
+        'the WSGI handler and the ASGI handler (sync and async views) under '
+        'concurrent load, on a throwaway test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--url-name', default='profile')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON.')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            users = self._seed(options['users'])
+            results = {}
+            for name, (handler, urlconf) in SCENARIOS.items():
+                with override_settings(ROOT_URLCONF=urlconf):
+                    clear_url_caches()
+                    path = reverse(options['url_name'])
+                    run = self._run_wsgi if handler == 'wsgi' else self._run_asgi
+                    latencies, elapsed = run(users, path, options['requests'], options['concurrency'])
+                    results[name] = summarize(latencies, elapsed)
+                clear_url_caches()
+        results['config'] = {key: options[key] for key in ('users', 'requests', 'concurrency', 'url_name')}
+        write_results(self, results, options['json'])
+
+    def _seed(self, count):
+        languages = Language.objects.bulk_create(
+            Language(code=f'l{i}', name=f'Language {i}') for i in range(10)
+        )
+        goals = Goal.objects.bulk_create(Goal(name=f'Goal {i}') for i in range(5))
+        interests = Interest.objects.bulk_create(Interest(name=f'Interest {i}') for i in range(5))
+        users = User.objects.bulk_create(
+            User(
+                username=f'bench{i}',
+                email=f'bench{i}@example.com',
+                native_language=languages[i % len(languages)],
+                bio='Benchmark user',
+            )
+            for i in range(count)
+        )
+        UserLanguage.objects.bulk_create(
+            UserLanguage(user=user, language=languages[(i + offset) % len(languages)], proficiency='B1')
+            for i, user in enumerate(users)
+            for offset in (1, 2, 3)
+        )
+        for user in users:
+            user.goals.set(goals[:2])
+            user.interests.set(interests[:3])
+        return users
+
+    def _run_wsgi(self, users, path, total, concurrency):
+        clients = []
+        for i in range(concurrency):
+            client = Client()
+            client.force_login(users[i % len(users)])
+            clients.append(client)
+
+        def worker(index):
+            client = clients[index % concurrency]
+            start = time.perf_counter()
+            response = client.get(path)
+            assert response.status_code == 200, response.status_code
+            return time.perf_counter() - start
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            start = time.perf_counter()
+            latencies = list(pool.map(worker, range(total)))
+            elapsed = time.perf_counter() - start
+        return latencies, elapsed
+
+    def _run_asgi(self, users, path, total, concurrency):
+        clients = []
+        for i in range(concurrency):
+            client = AsyncClient()
+            client.force_login(users[i % len(users)])
+            clients.append(client)
+
+        async def worker(client, queue, latencies):
+            while True:
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                start = time.perf_counter()
+                response = await client.get(path)
+                assert response.status_code == 200, response.status_code
+                latencies.append(time.perf_counter() - start)
+
+        async def main():
+            queue = asyncio.Queue()
+            for index in range(total):
+                queue.put_nowait(index)
+            latencies = []
+            start = time.perf_counter()
+            await asyncio.gather(*(worker(client, queue, latencies) for client in clients))
+            return latencies, time.perf_counter() - start
+
+        return asyncio.run(main())
@@ -0,0 +1,93 @@
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.urls import reverse
+
+from users.benchmarks import benchmark_database, summarize, write_results
+from users.matching import partner_index
+from users.models import User
+
+# settings_dict overrides per scenario; CONN_MAX_AGE=0 opens and closes a
+# connection for every request, which is what the old settings did.
+SCENARIOS = {
+    'per_request_connections': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False},
+    'persistent_connections': {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure per-request database connection overhead: the same view is '
+        'requested with a new connection per request and with persistent, '
+        'health-checked connections, on a throwaway test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        # The directory queries on every request; the profile is served from
+        # the fragment cache and the cached session/user once warm.
+        parser.add_argument('--url-name', default='partner_directory')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON.')
+
+    def handle(self, *args, **options):
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+            # Closing an in-memory test database is a no-op, a file makes
+            # connection setup cost something, as it does against a server.
+            fd, path = tempfile.mkstemp(suffix='.sqlite3')
+            os.close(fd)
+            os.unlink(path)
+            test_settings['NAME'] = path
+
+        opened = []
+
+        def count_connection(sender, connection, **kwargs):
+            opened.append(connection.alias)
+
+        results = {}
+        original = {key: connection.settings_dict.get(key) for key in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS')}
+        connection_created.connect(count_connection)
+        try:
+            with benchmark_database():
+                user = User.objects.create(username='bench', email='bench@example.com')
+                client = Client()
+                client.force_login(user)
+                path = reverse(options['url_name'])
+                for name, overrides in SCENARIOS.items():
+                    connection.close()
+                    connection.settings_dict.update(overrides)
+                    opened.clear()
+                    latencies = []
+                    start = time.perf_counter()
+                    for _ in range(options['requests']):
+                        request_start = time.perf_counter()
+                        response = client.get(path)
+                        assert response.status_code == 200, response.status_code
+                        # The test client unhooks this from request_finished,
+                        # run it the way the real handlers do.
+                        close_old_connections()
+                        latencies.append(time.perf_counter() - request_start)
+                    results[name] = summarize(latencies, time.perf_counter() - start)
+                    results[name]['connections_opened'] = len(opened)
+                    if not overrides['CONN_MAX_AGE'] and len(opened) != options['requests']:
+                        raise CommandError(
+                            f"{options['url_name']} opened {len(opened)} connections for {options['requests']} "
+                            'requests without persistent connections, it does not query on every request.'
+                        )
+                connection.settings_dict.update(original)
+        finally:
+            connection_created.disconnect(count_connection)
+            partner_index.clear()
+        results['config'] = {
+            'vendor': connection.vendor,
+            'requests': options['requests'],
+            'url_name': options['url_name'],
+        }
+        write_results(self, results, options['json'])
+        for name in SCENARIOS:
+            self.stdout.write(f"{name:<28} {results[name]['connections_opened']} connections opened")
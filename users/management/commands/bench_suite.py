@@ -0,0 +1,162 @@
+import json
+import platform
+import random
+import subprocess
+import time
+from datetime import datetime, timezone
+
+import django
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from users.benchmarks import benchmark_database, summarize, timer, write_results
+from users.matching import partner_index
+from users.models import Language, User, UserLanguage
+from users.seeding import BIO_WORDS, seed_users
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the main user-facing endpoints (profile, profile edit, add '
+        'language, partner matching, directory, search) on seeded populations '
+        'of each --sizes, every size on a fresh throwaway test database, and '
+        'emit JSON that can be compared across commits.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the JSON results to this file.')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON.')
+
+    def handle(self, *args, **options):
+        report = {
+            'meta': {
+                'revision': git_revision(),
+                'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'vendor': connection.vendor,
+                'requests': options['requests'],
+                'seed': options['seed'],
+            },
+            'results': {},
+        }
+        for size in options['sizes']:
+            with benchmark_database():
+                cache.clear()
+                partner_index.clear()
+                report['results'][str(size)] = self._run_size(size, options['requests'], options['seed'])
+            partner_index.clear()
+            if not options['json']:
+                self.stdout.write(f'-- {size} users')
+                write_results(self, report['results'][str(size)], False)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as handle:
+                json.dump(report, handle, indent=2, sort_keys=True)
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+
+    def _run_size(self, size, requests, seed):
+        results = {}
+        with timer() as elapsed:
+            seed_users(size, seed=seed, prefix='bench')
+        results['seed'] = {'seconds': round(elapsed[0], 2)}
+
+        rng = random.Random(seed)
+        ids = list(User.objects.order_by('pk').values_list('pk', flat=True)[:max(requests, 1) * 10])
+        sample = rng.sample(ids, min(len(ids), requests))
+        clients = {}
+
+        def client_for(user_id):
+            if user_id not in clients:
+                client = Client()
+                client.force_login(User.objects.get(pk=user_id))
+                clients[user_id] = client
+            return clients[user_id]
+
+        for user_id in sample:
+            client_for(user_id)
+
+        def run(name, make_request, before=None):
+            latencies, queries = [], 0
+            start = time.perf_counter()
+            for i in range(requests):
+                user_id = sample[i % len(sample)]
+                if before:
+                    before(user_id)
+                with CaptureQueriesContext(connection) as context:
+                    request_start = time.perf_counter()
+                    response = make_request(client_for(user_id), user_id, i)
+                    latencies.append(time.perf_counter() - request_start)
+                assert response.status_code in (200, 302), (name, response.status_code)
+                queries += len(context.captured_queries)
+            results[name] = summarize(latencies, time.perf_counter() - start)
+            results[name]['queries_per_request'] = round(queries / requests, 2)
+
+        profile = reverse('profile')
+        run('profile_view', lambda client, user_id, i: client.get(profile))
+        run('profile_view_uncached', lambda client, user_id, i: client.get(profile), before=lambda _: cache.clear())
+
+        edit = reverse('profile_edit')
+        run('profile_edit_get', lambda client, user_id, i: client.get(edit))
+        native = dict(User.objects.filter(pk__in=sample).values_list('pk', 'native_language_id'))
+        run('profile_edit_post', lambda client, user_id, i: client.post(edit, {
+            'first_name': 'Bench', 'last_name': str(i), 'bio': f'Updated bio {i}',
+            'native_language': native[user_id] or '', 'timezone': 'UTC',
+        }))
+
+        language_ids = list(Language.objects.values_list('pk', flat=True))
+        known = {}
+        for user_id, language_id in UserLanguage.objects.filter(user_id__in=sample).values_list('user_id', 'language_id'):
+            known.setdefault(user_id, set()).add(language_id)
+
+        def add_language(client, user_id, i):
+            missing = [pk for pk in language_ids if pk not in known.setdefault(user_id, set())]
+            if not missing:
+                return client.get(reverse('add_language'))
+            known[user_id].add(missing[0])
+            return client.post(reverse('add_language'), {'language': missing[0], 'proficiency': 'A1'})
+        run('add_language_post', add_language)
+
+        partner_index.clear()
+        with timer() as elapsed:
+            partner_index.ensure_built()
+        results['partner_index_build'] = {'seconds': round(elapsed[0], 3)}
+        partners = reverse('partners')
+        run('partners', lambda client, user_id, i: client.get(partners))
+
+        directory = reverse('partner_directory')
+        top_language = language_ids[0]
+        run('directory_first_page', lambda client, user_id, i: client.get(directory, {
+            'native_language': top_language,
+        }))
+        middle = User.objects.filter(native_language_id=top_language).order_by('pk').values_list('pk', flat=True)
+        middle = middle[max(middle.count() // 2 - 1, 0)] if middle.exists() else 0
+        run('directory_deep_page', lambda client, user_id, i: client.get(directory, {
+            'native_language': top_language, 'after': middle,
+        }))
+        run('directory_learning_filter', lambda client, user_id, i: client.get(directory, {
+            'learning_language': top_language, 'min_proficiency': 'B1', 'goals': [1],
+        }))
+
+        search = reverse('partner_search')
+        run('partner_search', lambda client, user_id, i: client.get(search, {
+            'q': f'{BIO_WORDS[i % len(BIO_WORDS)]} {BIO_WORDS[(i * 7) % len(BIO_WORDS)][:3]}',
+        }))
+        return results
@@ -0,0 +1,80 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from users.directory import filter_directory, proficiency_codes
+from users.models import User, UserLanguage
+
+# Postgres prints "Seq Scan on <table>", SQLite "SCAN <table>" (followed by
+# "USING ... INDEX" when it walks an index instead of the table).
+SEQ_SCAN_PATTERNS = [
+    re.compile(r'Seq Scan on (?P<table>\w+)'),
+    re.compile(r'\bSCAN (?P<table>\w+)(?! USING (?:COVERING )?INDEX)(?:\s|$)'),
+]
+
+
+def top_queries(using):
+    """The hottest read paths, with placeholder ids (plans do not depend on them)."""
+    users = User.objects.using(using)
+    # Directory queries are planned as a deep page, i.e. with an id cursor.
+    deep_page = users.filter(id__gt=1000)
+    user_languages = UserLanguage.objects.using(using)
+    return {
+        'profile_user': users.filter(pk=1),
+        'profile_languages': user_languages.filter(user_id=1).select_related('language').order_by('pk'),
+        'profile_goals': User.goals.through.objects.using(using).filter(user_id__in=[1]),
+        'profile_interests': User.interests.through.objects.using(using).filter(user_id__in=[1]),
+        'directory_native_language': deep_page.filter(native_language_id=1).order_by('id')[:21],
+        'directory_learning_language': filter_directory(deep_page, {
+            'learning_language': 1, 'min_proficiency': 'A2', 'max_proficiency': 'B2',
+        }).order_by('id')[:21],
+        'directory_goals': filter_directory(deep_page, {'goals': [1, 2]}).order_by('id')[:21],
+        'directory_interests': filter_directory(deep_page, {'interests': [1, 2]}).order_by('id')[:21],
+        'directory_timezone': deep_page.filter(timezone__in=['UTC']).order_by('id')[:21],
+        'learners_of_language': user_languages.filter(
+            language_id=1, proficiency__in=proficiency_codes('B1'),
+        ).values('user_id'),
+        'goal_holders': User.goals.through.objects.using(using).filter(goal_id=1).values('user_id'),
+        'interest_holders': User.interests.through.objects.using(using).filter(interest_id=1).values('user_id'),
+    }
+
+
+def find_seq_scans(plan):
+    tables = []
+    for pattern in SEQ_SCAN_PATTERNS:
+        tables.extend(match.group('table') for match in pattern.finditer(plan))
+    return tables
+
+
+class Command(BaseCommand):
+    help = (
+        'EXPLAIN the most frequent read queries and report any sequential '
+        'scans. Planners prefer sequential scans on tiny tables, so run this '
+        'against realistically sized data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every plan, not only offending ones.')
+        parser.add_argument('--fail', action='store_true', help='Exit with an error when a sequential scan is found.')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        vendor = connections[using].vendor
+        offenders = {}
+        for name, queryset in top_queries(using).items():
+            plan = queryset.explain()
+            tables = find_seq_scans(plan)
+            if tables:
+                offenders[name] = tables
+            if tables or options['verbose_plans']:
+                self.stdout.write(f'-- {name}')
+                self.stdout.write(plan)
+            status = self.style.ERROR(f"seq scan: {', '.join(tables)}") if tables else self.style.SUCCESS('ok')
+            self.stdout.write(f'{name:<32} {status}')
+
+        if not offenders:
+            self.stdout.write(self.style.SUCCESS(f'No sequential scans ({vendor}).'))
+        elif options['fail']:
+            raise CommandError(f"Sequential scans in: {', '.join(offenders)}")
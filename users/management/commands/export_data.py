@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from users.bulk import (
+    CATALOG_COLUMNS, CATALOG_MODELS, DEFAULT_CHUNK_SIZE, USER_COLUMNS, export_catalog, export_users, write_rows,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Export users, languages, goals or interests to a CSV or JSONL file '
+        '("-" writes to stdout) in the format import_data reads.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=['users', *CATALOG_MODELS])
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if options['kind'] == 'users':
+            rows, columns = export_users(options['chunk_size']), USER_COLUMNS
+        else:
+            model = CATALOG_MODELS[options['kind']]
+            rows, columns = export_catalog(model), CATALOG_COLUMNS[model]
+        count = write_rows(options['path'], rows, columns, options['format'])
+        self.stderr.write(self.style.SUCCESS(f"Exported {count} {options['kind']}."))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.bulk import (
+    CATALOG_MODELS, DEFAULT_CHUNK_SIZE, BulkImportError, UserImporter, import_catalog, read_rows,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Import users, languages, goals or interests from a CSV or JSONL file '
+        '("-" reads stdin). Users are streamed in chunks with bulk inserts; '
+        'import the lookup tables first so user rows can reference them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=['users', *CATALOG_MODELS])
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--update', action='store_true', help='Overwrite existing rows instead of skipping them.')
+
+    def handle(self, *args, **options):
+        rows = read_rows(options['path'], options['format'])
+        start = time.perf_counter()
+        try:
+            if options['kind'] == 'users':
+                importer = UserImporter(chunk_size=options['chunk_size'], update=options['update'])
+                stats = importer.run(rows)
+            else:
+                stats = import_catalog(CATALOG_MODELS[options['kind']], rows, update=options['update'])
+        except (BulkImportError, KeyError) as exc:
+            raise CommandError(f'Import failed: {exc}')
+        elapsed = time.perf_counter() - start
+        summary = ', '.join(f'{count} {name}' for name, count in stats.items())
+        self.stderr.write(self.style.SUCCESS(f"{options['kind']}: {summary} in {elapsed:.1f}s"))
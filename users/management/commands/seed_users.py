@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.bulk import DEFAULT_CHUNK_SIZE
+from users.seeding import LANGUAGES, seed_users
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a synthetic population: COUNT users with Zipf-skewed native '
+        'and learning languages, 1-4 learning languages each and random goals, '
+        'interests, timezones and bios. Missing seed languages/goals/interests '
+        'are created first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int)
+        parser.add_argument('--languages', type=int, default=len(LANGUAGES), help=f'At most {len(LANGUAGES)}.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, the same seed gives the same users.')
+        parser.add_argument('--prefix', default='seed', help='Username prefix.')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        stats = seed_users(
+            options['count'],
+            language_count=min(options['languages'], len(LANGUAGES)),
+            seed=options['seed'],
+            prefix=options['prefix'],
+            chunk_size=options['chunk_size'],
+        )
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {stats['created']} users ({stats['skipped']} already existed) in {elapsed:.1f}s"
+        ))
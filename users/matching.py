@@ -0,0 +1,420 @@
+"""
+In-memory reciprocal partner index.
+
+A user with native language N who learns language L is stored under the
+key (N, L). Partners for someone with native M who learns S are exactly the
+users stored under (s, M) for every s in S, so candidate lookup is a handful
+of set unions instead of a join across users_user and users_userlanguage.
+
+The timezone signal is the weekly time both users are free (see
+users.availability) when both entered availability slots, and how far
+apart their UTC offsets are otherwise.
+
+Every process holds its own index. A process that changes a profile
+refreshes its copy and publishes the user ids through the Django cache: a
+shared version counter plus one entry per version. The other processes
+compare the counter with the version they have applied at most once per
+PARTNER_INDEX_CHECK_INTERVAL seconds, re-read the users listed since, and
+rebuild instead when the log has a gap (expired entries, a flushed cache)
+or asks for it (bulk imports).
+"""
+import heapq
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .availability import AvailabilityIndex, load_slots, overlap_ratio
+from .catalogs import languages
+from .models import AvailabilitySlot, User, UserLanguage
+from .overlap import BitIndex, TagMatrix
+from .routers import PRIMARY
+
+PROFICIENCY_LEVELS = {
+    code: level for level, (code, _label) in enumerate(UserLanguage.PROFICIENCY_CHOICES)
+}
+MAX_LEVEL_GAP = len(PROFICIENCY_LEVELS) - 1
+# Weekly time together that counts as "available when I am".
+MIN_SHARED_MINUTES = 60
+
+# Relative weight of each ranking signal, the final score is in [0, 1].
+WEIGHTS = {
+    'proficiency': 0.4,
+    'goals': 0.2,
+    'interests': 0.2,
+    'timezone': 0.2,
+}
+
+VERSION_KEY = 'partner_index:version'
+CHANGE_KEY = 'partner_index:change:{}'
+CHANGE_TIMEOUT = 60 * 60
+# Replaying more users than this costs more than a rebuild.
+MAX_REPLAY_USERS = 500
+REBUILD = 'rebuild'
+
+
+def utc_offset_minutes(tz_name):
+    """The current UTC offset of ``tz_name``, 0 for unknown names."""
+    # Keyed by the hour, clocks are moved on the hour.
+    return _utc_offset_minutes(tz_name, int(time.time() // 3600))
+
+
+@lru_cache(maxsize=4096)
+def _utc_offset_minutes(tz_name, hour):
+    try:
+        offset = datetime.fromtimestamp(hour * 3600, ZoneInfo(tz_name)).utcoffset()
+    except (ZoneInfoNotFoundError, ValueError):
+        return 0
+    return int(offset.total_seconds() // 60)
+
+
+def timezone_overlap(offset_a, offset_b):
+    diff = abs(offset_a - offset_b) % (24 * 60)
+    diff = min(diff, 24 * 60 - diff)
+    return 1 - diff / (12 * 60)
+
+
+@dataclass(slots=True)
+class PartnerProfile:
+    native_id: int | None
+    timezone: str
+    learning: dict = field(default_factory=dict)
+    goals: int = 0
+    interests: int = 0
+
+    def pair_keys(self):
+        if self.native_id is None:
+            return []
+        return [(self.native_id, language_id) for language_id in self.learning]
+
+
+@dataclass(frozen=True, slots=True)
+class PartnerMatch:
+    user_id: int
+    score: float
+
+
+class PartnerIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._profiles = {}
+        self._pairs = defaultdict(set)
+        self._goals = TagMatrix()
+        self._interests = TagMatrix()
+        self._goal_bits = BitIndex()
+        self._interest_bits = BitIndex()
+        self._availability = AvailabilityIndex()
+        self._built = False
+        self._version = 0
+        self._checked_at = 0.0
+
+    @property
+    def is_built(self):
+        return self._built
+
+    def clear(self):
+        with self._lock:
+            self._profiles = {}
+            self._pairs = defaultdict(set)
+            self._goals = TagMatrix()
+            self._interests = TagMatrix()
+            self._goal_bits = BitIndex()
+            self._interest_bits = BitIndex()
+            self._availability = AvailabilityIndex()
+            self._built = False
+            self._version = 0
+            self._checked_at = 0.0
+
+    def build(self):
+        # Read first, changes published while loading are replayed later.
+        # Rows come from the primary, a lagging replica would lose them.
+        version = _current_version()
+        profiles = {
+            user_id: PartnerProfile(native_id, tz_name)
+            for user_id, native_id, tz_name in User.objects.using(PRIMARY).filter(
+                is_active=True
+            ).values_list('id', 'native_language_id', 'timezone').iterator()
+        }
+        goal_ids, interest_ids = self._load_related(
+            profiles, UserLanguage.objects.using(PRIMARY), User.goals.through.objects.using(PRIMARY),
+            User.interests.through.objects.using(PRIMARY),
+        )
+
+        pairs = defaultdict(set)
+        goals = TagMatrix(capacity=max(len(profiles), 1))
+        interests = TagMatrix(capacity=max(len(profiles), 1))
+        goal_bits, interest_bits = BitIndex(), BitIndex()
+        for user_id, profile in profiles.items():
+            for key in profile.pair_keys():
+                pairs[key].add(user_id)
+            profile.goals = goal_bits.mask(goal_ids.get(user_id, ()))
+            profile.interests = interest_bits.mask(interest_ids.get(user_id, ()))
+            goals.set(user_id, profile.goals)
+            interests.set(user_id, profile.interests)
+        availability = AvailabilityIndex()
+        for user_id, slots in load_slots(AvailabilitySlot.objects.using(PRIMARY)).items():
+            if user_id in profiles:
+                availability.set_user(user_id, profiles[user_id].timezone, slots)
+
+        with self._lock:
+            self._profiles = profiles
+            self._pairs = pairs
+            self._goals = goals
+            self._interests = interests
+            self._goal_bits = goal_bits
+            self._interest_bits = interest_bits
+            self._availability = availability
+            self._built = True
+            self._version = version
+            self._checked_at = time.monotonic()
+
+    def ensure_built(self):
+        if not self._built:
+            self.build()
+        else:
+            self.sync()
+
+    def sync(self):
+        """Apply what other processes published, at most once per check interval."""
+        interval = getattr(settings, 'PARTNER_INDEX_CHECK_INTERVAL', 2.0)
+        now = time.monotonic()
+        if not self._built or now - self._checked_at < interval:
+            return
+        self._checked_at = now
+        current = cache.get(VERSION_KEY)
+        if current == self._version:
+            return
+        if current is None or current < self._version:
+            # The cache was flushed, the log is gone.
+            self.build()
+            return
+        versions = range(self._version + 1, current + 1)
+        changes = cache.get_many([CHANGE_KEY.format(version) for version in versions])
+        user_ids, applied = set(), self._version
+        for version in versions:
+            change = changes.get(CHANGE_KEY.format(version))
+            if change is None and version == current:
+                # Counted but not written yet, picked up on the next check.
+                break
+            if change is None or change == REBUILD or len(user_ids) + len(change) > MAX_REPLAY_USERS:
+                self.build()
+                return
+            user_ids.update(change)
+            applied = version
+        for user_id in sorted(user_ids):
+            self.refresh_user(user_id)
+        self._version = applied
+
+    def publish(self, user_ids=None):
+        """
+        Tell the other processes to re-read ``user_ids``, or to rebuild when
+        None. Call it after commit, with this process' copy already updated.
+        """
+        version = _next_version()
+        cache.set(CHANGE_KEY.format(version), REBUILD if user_ids is None else list(user_ids), CHANGE_TIMEOUT)
+        with self._lock:
+            if self._built and version == self._version + 1:
+                self._version = version
+
+    def users_changed(self, user_ids):
+        """Refresh ``user_ids`` here and in every other process."""
+        for user_id in user_ids:
+            self.refresh_user(user_id)
+        self.publish(user_ids)
+
+    def invalidate(self):
+        """Rebuild on next use, here and in every other process."""
+        self.clear()
+        self.publish()
+
+    def refresh_user(self, user_id):
+        """Re-read one user's rows, a no-op until the index has been built."""
+        if not self._built:
+            return
+        row = User.objects.using(PRIMARY).filter(pk=user_id, is_active=True).values_list(
+            'native_language_id', 'timezone'
+        ).first()
+        profile = None
+        if row is not None:
+            profile = PartnerProfile(row[0], row[1])
+            goal_ids, interest_ids = self._load_related(
+                {user_id: profile},
+                UserLanguage.objects.using(PRIMARY).filter(user_id=user_id),
+                User.goals.through.objects.using(PRIMARY).filter(user_id=user_id),
+                User.interests.through.objects.using(PRIMARY).filter(user_id=user_id),
+            )
+            slots = load_slots(AvailabilitySlot.objects.using(PRIMARY).filter(user_id=user_id)).get(user_id, ())
+
+        with self._lock:
+            self._discard(user_id)
+            if profile is not None:
+                self._profiles[user_id] = profile
+                for key in profile.pair_keys():
+                    self._pairs[key].add(user_id)
+                # Bits are handed out under the lock, a rebuild swaps the maps.
+                profile.goals = self._goal_bits.mask(goal_ids.get(user_id, ()))
+                profile.interests = self._interest_bits.mask(interest_ids.get(user_id, ()))
+                self._goals.set(user_id, profile.goals)
+                self._interests.set(user_id, profile.interests)
+                self._availability.set_user(user_id, row[1], slots)
+
+    def remove_user(self, user_id):
+        with self._lock:
+            self._discard(user_id)
+
+    def get_profile(self, user_id):
+        return self._profiles.get(user_id)
+
+    def candidates(self, user_id):
+        self.ensure_built()
+        with self._lock:
+            profile = self._profiles.get(user_id)
+            if profile is None or profile.native_id is None:
+                return set()
+            found = set()
+            for language_id in profile.learning:
+                found |= self._pairs.get((language_id, profile.native_id), set())
+            found.discard(user_id)
+            return found
+
+    def are_partners(self, user_id, other_id):
+        """Whether the two users are matched, which the pair relation makes symmetric."""
+        return other_id in self.candidates(user_id)
+
+    def pair_score(self, profile, other):
+        # How well the other person speaks my native language against how
+        # well I speak theirs, smaller gaps make for more balanced sessions.
+        mine = profile.learning.get(other.native_id, 0)
+        theirs = other.learning.get(profile.native_id, 0)
+        proficiency = 1 - abs(mine - theirs) / MAX_LEVEL_GAP
+        return WEIGHTS['proficiency'] * proficiency
+
+    def shared_minutes(self, user_id, candidate_ids):
+        """Minutes per week ``user_id`` and each candidate are both available."""
+        self._availability.sync()
+        return self._availability.shared_minutes(self._availability.mask(user_id), candidate_ids)
+
+    def schedule_scores(self, user_id, candidate_ids, shared):
+        """
+        Weighted share of the time both are available where both entered
+        slots, closeness of the UTC offsets for everyone else.
+        """
+        profile = self._profiles[user_id]
+        timezones = [self._profiles[candidate_id].timezone for candidate_id in candidate_ids]
+        # Looked up now rather than stored, offsets move with DST.
+        utc_offsets = {name: utc_offset_minutes(name) for name in {profile.timezone, *timezones}}
+        offsets = np.fromiter(
+            (timezone_overlap(utc_offsets[profile.timezone], utc_offsets[name]) for name in timezones),
+            dtype=np.float64,
+            count=len(candidate_ids),
+        )
+        mine = self._availability.total_minutes([user_id])
+        theirs = self._availability.total_minutes(candidate_ids)
+        ratio = overlap_ratio(shared, mine, theirs)
+        return WEIGHTS['timezone'] * np.where((mine > 0) & (theirs > 0), ratio, offsets)
+
+    def overlap_scores(self, user_id, candidate_ids):
+        """Weighted goal and interest Jaccard of ``user_id`` against each candidate."""
+        with self._lock:
+            # Read with the matrices, the bit positions change on a rebuild.
+            profile = self._profiles.get(user_id)
+            if profile is None:
+                return np.zeros(len(candidate_ids))
+            goals = self._goals.jaccard(profile.goals, self._goals.rows_for(candidate_ids))
+            interests = self._interests.jaccard(profile.interests, self._interests.rows_for(candidate_ids))
+        return WEIGHTS['goals'] * goals + WEIGHTS['interests'] * interests
+
+    def top_partners(self, user_id, limit=10, min_overlap=0):
+        """
+        Best ranked candidates, only those free together with ``user_id``
+        for at least ``min_overlap`` minutes a week when it is given.
+        """
+        candidate_ids = [
+            candidate_id for candidate_id in self.candidates(user_id)
+            if candidate_id in self._profiles
+        ]
+        profile = self._profiles.get(user_id)
+        if not candidate_ids or profile is None:
+            return []
+        shared = self.shared_minutes(user_id, candidate_ids)
+        if min_overlap:
+            keep = shared >= min_overlap
+            candidate_ids = [candidate_id for candidate_id, kept in zip(candidate_ids, keep) if kept]
+            shared = shared[keep]
+            if not candidate_ids:
+                return []
+        scores = (
+            self.overlap_scores(user_id, candidate_ids)
+            + self.schedule_scores(user_id, candidate_ids, shared)
+            + np.fromiter(
+                (self.pair_score(profile, self._profiles[candidate_id]) for candidate_id in candidate_ids),
+                dtype=np.float64,
+                count=len(candidate_ids),
+            )
+        )
+        scored = (PartnerMatch(candidate_id, float(score)) for candidate_id, score in zip(candidate_ids, scores))
+        return heapq.nlargest(limit, scored, key=lambda match: (match.score, -match.user_id))
+
+    def _discard(self, user_id):
+        old = self._profiles.pop(user_id, None)
+        if old is None:
+            return
+        for key in old.pair_keys():
+            members = self._pairs.get(key)
+            if members is not None:
+                members.discard(user_id)
+                if not members:
+                    del self._pairs[key]
+        self._goals.discard(user_id)
+        self._interests.discard(user_id)
+        self._availability.remove_user(user_id)
+
+    @staticmethod
+    def _load_related(profiles, user_languages, user_goals, user_interests):
+        for user_id, language_id, proficiency in user_languages.values_list(
+            'user_id', 'language_id', 'proficiency'
+        ).iterator():
+            if user_id in profiles:
+                profiles[user_id].learning[language_id] = PROFICIENCY_LEVELS.get(proficiency, 0)
+
+        goals = defaultdict(set)
+        for user_id, goal_id in user_goals.values_list('user_id', 'goal_id').iterator():
+            goals[user_id].add(goal_id)
+        interests = defaultdict(set)
+        for user_id, interest_id in user_interests.values_list('user_id', 'interest_id').iterator():
+            interests[user_id].add(interest_id)
+        return goals, interests
+
+
+def _current_version():
+    cache.add(VERSION_KEY, 0, timeout=None)
+    return cache.get(VERSION_KEY, 0)
+
+
+def _next_version():
+    cache.add(VERSION_KEY, 0, timeout=None)
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        # Evicted since the add, start the log over.
+        cache.set(VERSION_KEY, 1, timeout=None)
+        return 1
+
+
+partner_index = PartnerIndex()
+
+
+def find_partners(user, limit=10, min_overlap=0):
+    """Return the best ranked partners for ``user`` as ``(user, score)`` pairs."""
+    matches = partner_index.top_partners(user.pk, limit=limit, min_overlap=min_overlap)
+    users = User.objects.in_bulk([match.user_id for match in matches])
+    for partner in users.values():
+        partner.native_language = languages.get(partner.native_language_id)
+    return [(users[match.user_id], match.score) for match in matches if match.user_id in users]
@@ -0,0 +1,339 @@
+"""
+Per-request cost accounting.
+
+RequestMetricsMiddleware measures, for each sampled request, the number of
+SQL queries and the time spent in them, the time spent rendering templates
+and the response size. The numbers are sent back in a Server-Timing header
+(visible in the browser's network panel) and folded into histograms keyed
+by URL name.
+
+Queries are counted by an execute wrapper installed on every database
+connection when it is opened, templates by the InstrumentedDjangoTemplates
+backend. Both only look at a context variable that is set for sampled
+requests, so unsampled requests (METRICS_SAMPLE_RATE, 5% by default) pay
+for one random() call and nothing else. Methods outside METHODS are
+recorded as "other" so a client cannot grow the label set.
+
+The registry also holds the counters and gauges exported by the /metrics
+view (cache lookups, WebSocket connections, sign-ups and logins, avatar
+queue depth). Under several worker processes (gunicorn, multiple daphne
+instances) set METRICS_DIR: every process then writes its own numbers to
+<METRICS_DIR>/<pid>.json at most once per METRICS_FLUSH_INTERVAL seconds
+and the view adds up all the files. Counters and histograms of processes
+that have exited are kept, their gauges are dropped. Empty the directory
+when the server starts.
+"""
+import atexit
+import json
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+BYTES_BUCKETS = (1_000, 5_000, 10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000)
+DEFAULT_SAMPLE_RATE = 0.05
+METHODS = frozenset({'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'})
+
+# name: (help, buckets)
+HISTOGRAMS = {
+    'request_duration_seconds': ('Time spent serving the request.', SECONDS_BUCKETS),
+    'request_db_queries': ('SQL queries executed per request.', QUERY_BUCKETS),
+    'request_db_seconds': ('Time spent in SQL queries per request.', SECONDS_BUCKETS),
+    'request_template_seconds': ('Time spent rendering templates per request.', SECONDS_BUCKETS),
+    'response_size_bytes': ('Response body size.', BYTES_BUCKETS),
+}
+
+COUNTERS = {
+    'cache_lookups_total': 'Profile and catalog cache lookups by result (hit/miss).',
+    'auth_signups_total': 'Accounts created through allauth.',
+    'auth_logins_total': 'Successful logins.',
+    'auth_login_failures_total': 'Failed login attempts.',
+}
+GAUGES = {
+    'websocket_connections': 'Open WebSocket connections by consumer.',
+    'avatar_queue_depth': 'Avatars waiting for thumbnail processing.',
+}
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    __slots__ = ('queries', 'db_seconds', 'template_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+
+
+def current_metrics():
+    return _current.get()
+
+
+def metrics_dir():
+    directory = getattr(settings, 'METRICS_DIR', None)
+    return Path(directory) if directory else None
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+class MetricsRegistry:
+    """Histograms, counters and gauges per metric name and label values."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+        self._flusher = None
+
+    def observe(self, name, value, **labels):
+        buckets = HISTOGRAMS[name][1]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            series = self._data.get(key)
+            if series is None:
+                # One counter per bucket plus +Inf, then sum and count.
+                series = self._data[key] = [0] * (len(buckets) + 1) + [0.0, 0]
+            series[bisect_left(buckets, value)] += 1
+            series[-2] += value
+            series[-1] += 1
+        self._start_flusher()
+
+    def inc(self, name, amount=1, **labels):
+        """Add to a counter, or to a gauge (a negative amount decrements it)."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._data[key] = self._data.get(key, 0) + amount
+        self._start_flusher()
+
+    def dec(self, name, amount=1, **labels):
+        self.inc(name, -amount, **labels)
+
+    def snapshot(self):
+        with self._lock:
+            return {key: list(value) if isinstance(value, list) else value for key, value in self._data.items()}
+
+    def reset(self):
+        with self._lock:
+            self._data.clear()
+
+    def flush(self):
+        """Write this process' values to METRICS_DIR, atomically."""
+        directory = metrics_dir()
+        if directory is None:
+            return
+        directory.mkdir(parents=True, exist_ok=True)
+        rows = [[name, list(labels), value] for (name, labels), value in self.snapshot().items()]
+        path = directory / f'{os.getpid()}.json'
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(rows))
+        os.replace(tmp, path)
+
+    def collect(self):
+        """Values summed over all processes, in the snapshot() format."""
+        directory = metrics_dir()
+        if directory is None:
+            return self.snapshot()
+        self.flush()
+        merged = {}
+        for path in directory.glob('*.json'):
+            try:
+                rows = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            alive = path.stem == str(os.getpid()) or _pid_alive(int(path.stem))
+            for name, labels, value in rows:
+                if name in GAUGES and not alive:
+                    continue
+                key = (name, tuple(tuple(pair) for pair in labels))
+                current = merged.get(key)
+                if current is None:
+                    merged[key] = value
+                elif isinstance(value, list):
+                    merged[key] = [a + b for a, b in zip(current, value)]
+                else:
+                    merged[key] = current + value
+        return merged
+
+    def _start_flusher(self):
+        # Started lazily, and again after a fork, so each worker has its own.
+        if self._flusher == os.getpid() or metrics_dir() is None:
+            return
+        self._flusher = os.getpid()
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5.0)
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                self.flush()
+        threading.Thread(target=loop, name='metrics-flush', daemon=True).start()
+        atexit.register(self.flush)
+
+
+registry = MetricsRegistry()
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in pairs
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+def render_prometheus(values=None):
+    """The registry in the Prometheus text exposition format."""
+    values = registry.collect() if values is None else values
+    by_name = {}
+    for (name, labels), value in sorted(values.items(), key=lambda item: (item[0][0], item[0][1])):
+        by_name.setdefault(name, []).append((labels, value))
+    lines = []
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for labels, series in by_name.get(name, ()):
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ['+Inf'], series):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {series[-2]}')
+            lines.append(f'{name}_count{_format_labels(labels)} {series[-1]}')
+    for kind, definitions in (('counter', COUNTERS), ('gauge', GAUGES)):
+        for name, help_text in definitions.items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+            for labels, value in by_name.get(name, ()):
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+
+    # Ratios are derived here so dashboards do not need the PromQL for them.
+    lookups = {}
+    for labels, value in by_name.get('cache_lookups_total', ()):
+        labels = dict(labels)
+        lookups.setdefault(labels['cache'], {})[labels['result']] = value
+    lines += ['# HELP cache_hit_ratio Share of cache lookups that were hits.', '# TYPE cache_hit_ratio gauge']
+    for cache_name, results in sorted(lookups.items()):
+        total = sum(results.values())
+        if total:
+            lines.append(f'cache_hit_ratio{_format_labels([("cache", cache_name)])} {results.get("hit", 0) / total:.4f}')
+    return '\n'.join(lines) + '\n'
+
+
+def sample_rate():
+    return getattr(settings, 'METRICS_SAMPLE_RATE', DEFAULT_SAMPLE_RATE)
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_seconds += time.perf_counter() - start
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_seconds += time.perf_counter() - start
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates whose templates report their render time."""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return InstrumentedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= sample_rate():
+            return self.get_response(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        if random.random() >= sample_rate():
+            return await self.get_response(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics, time.perf_counter() - start)
+
+    def _finish(self, request, response, metrics, duration):
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name or match.view_name) if match else 'unresolved'
+        labels = {'view': view, 'method': request.method if request.method in METHODS else 'other'}
+        registry.observe('request_duration_seconds', duration, **labels)
+        registry.observe('request_db_queries', metrics.queries, **labels)
+        registry.observe('request_db_seconds', metrics.db_seconds, **labels)
+        registry.observe('request_template_seconds', metrics.template_seconds, **labels)
+        if not response.streaming:
+            registry.observe('response_size_bytes', len(response.content), **labels)
+        if getattr(settings, 'METRICS_SERVER_TIMING', True):
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={metrics.db_seconds * 1000:.2f};desc="{metrics.queries} queries"',
+                f'tpl;dur={metrics.template_seconds * 1000:.2f}',
+                f'total;dur={duration * 1000:.2f}',
+            ])
+        return response
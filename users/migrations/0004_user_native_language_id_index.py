@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0003_user_avatar_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['native_language', 'id'], name='users_user_native_id_idx'),
+        ),
+    ]
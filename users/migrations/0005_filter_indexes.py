@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0004_user_native_language_id_index'),
+    ]
+
+    # The M2M through tables only have the (user_id, <tag>_id) unique index
+    # plus single-column FK indexes; "who has tag X" lookups need the
+    # reverse composite. The through models are auto-created, so the indexes
+    # are managed with plain SQL.
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX users_user_goals_goal_user_idx ON users_user_goals (goal_id, user_id)',
+            'DROP INDEX users_user_goals_goal_user_idx',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX users_user_interests_interest_user_idx ON users_user_interests (interest_id, user_id)',
+            'DROP INDEX users_user_interests_interest_user_idx',
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['timezone'], name='users_user_timezone_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userlanguage',
+            index=models.Index(fields=['language', 'proficiency', 'user'], name='users_ul_lang_prof_idx'),
+        ),
+    ]
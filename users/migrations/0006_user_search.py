@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from users.search import create_index
+    create_index(schema_editor)
+
+
+def drop_search_index(apps, schema_editor):
+    from users.search import drop_index
+    drop_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+    """
+    Full-text index over first_name, last_name and bio (see users.search):
+    an FTS5 table on SQLite, a tsvector + GIN table on PostgreSQL, nothing on
+    other backends. Existing users are indexed here.
+    """
+
+    dependencies = [
+        ('users', '0005_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
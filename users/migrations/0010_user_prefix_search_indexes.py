@@ -0,0 +1,39 @@
+from django.db import migrations
+
+INDEXES = {
+    'users_user_email_prefix_idx': 'email',
+    'users_user_username_prefix_idx': 'username',
+}
+
+
+def create_prefix_indexes(apps, schema_editor):
+    # istartswith is LIKE on SQLite (case-insensitive, served by a NOCASE
+    # index) and UPPER(col::text) LIKE UPPER(...) on PostgreSQL.
+    vendor = schema_editor.connection.vendor
+    for name, column in INDEXES.items():
+        if vendor == 'sqlite':
+            schema_editor.execute(f'CREATE INDEX {name} ON users_user ({column} COLLATE NOCASE)')
+        elif vendor == 'postgresql':
+            schema_editor.execute(f'CREATE INDEX {name} ON users_user (UPPER({column}::text) text_pattern_ops)')
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        for name in INDEXES:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+    """
+    Case-insensitive prefix indexes on username and email for the admin
+    search (see CustomUserAdmin.get_search_results), on SQLite and
+    PostgreSQL only.
+    """
+
+    dependencies = [
+        ('users', '0009_availabilityslot'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
@@ -1,5 +1,7 @@
+from django.core.exceptions import ValidationError
 from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager as BaseUserManager
+from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _
 
 class Language(models.Model):
@@ -21,8 +23,27 @@ class Interest(models.Model):
     def __str__(self):
         return self.name
 
+class UserQuerySet(models.QuerySet):
+    def with_profile(self):
+        """Everything profile.html renders, in a fixed number of queries."""
+        return self.select_related('native_language').prefetch_related(
+            models.Prefetch(
+                'userlanguage_set',
+                queryset=UserLanguage.objects.select_related('language').order_by('pk'),
+            ),
+            'goals',
+            'interests',
+        )
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
+    pass
+
+
 class User(AbstractUser):
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
+    # {size: {extension: storage name}}, filled in by users.avatars.
+    avatar_thumbnails = models.JSONField(default=dict, blank=True, editable=False)
     bio = models.TextField(blank=True)
     birth_date = models.DateField(null=True, blank=True)
     native_language = models.ForeignKey(
@@ -41,10 +62,37 @@ class User(AbstractUser):
     )
     goals = models.ManyToManyField(Goal, blank=True)
     interests = models.ManyToManyField(Interest, blank=True)
+    # Bumped by every profile edit (see save() and users.signals), used as
+    # the ETag/Last-Modified of the profile page.
+    profile_updated_at = models.DateTimeField(default=now, editable=False)
+
+    objects = UserManager()
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Directory pages filter on native language and seek by id.
+            models.Index(fields=['native_language', 'id'], name='users_user_native_id_idx'),
+            models.Index(fields=['timezone'], name='users_user_timezone_idx'),
+            # Exact email lookups; the admin's prefix search uses the
+            # case-insensitive indexes from migration 0010.
+            models.Index(fields=['email'], name='users_user_email_idx'),
+        ]
 
     def __str__(self):
         return self.email
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        # Logging in only touches last_login, which the profile does not show.
+        if update_fields is None or not set(update_fields) <= {'last_login'}:
+            self.profile_updated_at = now()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'profile_updated_at'}
+        super().save(*args, **kwargs)
+
+    def avatar_thumbnail(self, size, extension='jpg'):
+        return (self.avatar_thumbnails or {}).get(str(size), {}).get(extension)
+
 class UserLanguage(models.Model):
     PROFICIENCY_CHOICES = [
         ('A1', 'Beginner (A1)'),
@@ -61,6 +109,39 @@ class UserLanguage(models.Model):
 
     class Meta:
         unique_together = ('user', 'language')
+        indexes = [
+            # Learners of a language at a level; user_id makes it covering
+            # for the directory's EXISTS subquery.
+            models.Index(fields=['language', 'proficiency', 'user'], name='users_ul_lang_prof_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.language.name} ({self.proficiency})"
+
+class AvailabilitySlot(models.Model):
+    """A weekly window, in the user's own timezone, when they can practise."""
+
+    WEEKDAY_CHOICES = [
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    start_time = models.TimeField()
+    end_time = models.TimeField(help_text=_('Use 23:59 for the end of the day.'))
+
+    class Meta:
+        ordering = ['weekday', 'start_time']
+
+    def __str__(self):
+        return f"{self.user.username} - {self.get_weekday_display()} {self.start_time:%H:%M}-{self.end_time:%H:%M}"
+
+    def clean(self):
+        if self.start_time is not None and self.end_time is not None and self.end_time <= self.start_time:
+            raise ValidationError({'end_time': _('The slot has to end after it starts.')})
@@ -0,0 +1,148 @@
+"""
+Compact goal/interest membership for similarity ranking.
+
+Every user's goals (or interests) are a Python ``int`` with one bit set for
+each related row. :class:`BitIndex` hands out the bit positions densely in
+order of first use, so a mask is as wide as the number of distinct tags and
+not as the largest pk. :class:`TagMatrix` keeps the same masks packed into a
+``uint64`` NumPy array so one user can be scored against any number of
+candidates with a couple of vectorized popcounts.
+"""
+import numpy as np
+
+WORD_BITS = 64
+
+
+def mask_from_ids(ids):
+    mask = 0
+    for pk in ids:
+        mask |= 1 << pk
+    return mask
+
+
+def ids_from_mask(mask):
+    ids = []
+    while mask:
+        low = mask & -mask
+        ids.append(low.bit_length() - 1)
+        mask ^= low
+    return ids
+
+
+def jaccard(mask_a, mask_b):
+    union = (mask_a | mask_b).bit_count()
+    if not union:
+        return 0.0
+    return (mask_a & mask_b).bit_count() / union
+
+
+class BitIndex:
+    """Dense bit positions for sparse ids such as catalog pks."""
+
+    def __init__(self):
+        self._bits = {}
+
+    def __len__(self):
+        return len(self._bits)
+
+    def bit(self, pk):
+        bit = self._bits.get(pk)
+        if bit is None:
+            bit = self._bits[pk] = len(self._bits)
+        return bit
+
+    def mask(self, ids):
+        return mask_from_ids(self.bit(pk) for pk in ids)
+
+
+def _words_for(mask):
+    return max(1, -(-mask.bit_length() // WORD_BITS))
+
+
+def _to_words(mask, words):
+    return np.frombuffer(mask.to_bytes(words * 8, 'little'), dtype='<u8')
+
+
+class TagMatrix:
+    """Row-per-user bitset matrix, resized in place as users and tags grow."""
+
+    def __init__(self, capacity=1024, words=1):
+        self._data = np.zeros((capacity, words), dtype=np.uint64)
+        self._rows = {}
+        self._free = []
+        self._size = 0
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, user_id):
+        return user_id in self._rows
+
+    @property
+    def words(self):
+        return self._data.shape[1]
+
+    def set(self, user_id, mask):
+        words = _words_for(mask)
+        if words > self.words:
+            self._resize(self._data.shape[0], words)
+        row = self._rows.get(user_id)
+        if row is None:
+            row = self._allocate()
+            self._rows[user_id] = row
+        self._data[row] = _to_words(mask, self.words)
+
+    def discard(self, user_id):
+        row = self._rows.pop(user_id, None)
+        if row is not None:
+            self._data[row] = 0
+            self._free.append(row)
+
+    def get(self, user_id):
+        row = self._rows.get(user_id)
+        if row is None:
+            return 0
+        return int.from_bytes(self._data[row].astype('<u8').tobytes(), 'little')
+
+    def rows_for(self, user_ids):
+        """Matrix row indexes for ``user_ids``, users without a row map to -1."""
+        rows = self._rows
+        return np.fromiter((rows.get(pk, -1) for pk in user_ids), dtype=np.int64, count=len(user_ids))
+
+    def jaccard(self, mask, rows):
+        """Jaccard similarity between ``mask`` and every row in ``rows``."""
+        width = self.words * WORD_BITS
+        target = _to_words(mask & ((1 << width) - 1), self.words)
+        # Tags beyond the matrix width belong to nobody else, so they can
+        # only grow the union.
+        extra = (mask >> width).bit_count()
+        block = self._block(rows)
+        intersection = np.bitwise_count(block & target).sum(axis=1, dtype=np.int64)
+        union = np.bitwise_count(block | target).sum(axis=1, dtype=np.int64) + extra
+        return np.divide(intersection, union, out=np.zeros(len(rows)), where=union > 0)
+
+    def intersection_counts(self, mask, rows):
+        """Number of bits ``mask`` shares with every row in ``rows``."""
+        target = _to_words(mask & ((1 << self.words * WORD_BITS) - 1), self.words)
+        return np.bitwise_count(self._block(rows) & target).sum(axis=1, dtype=np.int64)
+
+    def _block(self, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        block = self._data[np.where(rows < 0, 0, rows)]
+        block[rows < 0] = 0
+        return block
+
+    def _allocate(self):
+        if self._free:
+            return self._free.pop()
+        if self._size == self._data.shape[0]:
+            self._resize(self._data.shape[0] * 2, self.words)
+        row = self._size
+        self._size += 1
+        return row
+
+    def _resize(self, capacity, words):
+        data = np.zeros((capacity, words), dtype=np.uint64)
+        old_capacity, old_words = self._data.shape
+        data[:old_capacity, :old_words] = self._data
+        self._data = data
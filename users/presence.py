@@ -0,0 +1,198 @@
+"""
+Online presence for the WebSocket layer.
+
+Who is online is kept in Redis (or in process memory when Redis is not
+configured, e.g. under tests): one set of online user ids per native
+language, plus a connection counter per user so several tabs count once.
+
+In Redis every change is one Lua script, so the counter and the sets cannot
+disagree when two connections of a user come and go at the same time. The
+sets are sorted sets scored by an expiry time and the counter key has a TTL
+(PRESENCE_TTL seconds), both pushed forward by each connection's heartbeat
+every PRESENCE_HEARTBEAT_INTERVAL seconds. Users of a server that died
+without disconnecting drop out once their TTL has passed.
+
+Changes are not broadcast one by one. :class:`PresenceBatcher` collects
+them per language and sends a single group message per language every
+PRESENCE_FLUSH_INTERVAL seconds, so a burst of N connects costs one message
+per subscriber instead of N.
+"""
+import asyncio
+import time
+from collections import defaultdict
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+from redis.asyncio import Redis
+
+ONLINE_KEY = 'presence:online'
+
+# KEYS: connection counter, online set, [language set]; ARGV: user id, ttl, now.
+CONNECT_SCRIPT = """
+local count = redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+local expires = tonumber(ARGV[3]) + tonumber(ARGV[2])
+for i = 2, #KEYS do
+    redis.call('ZREMRANGEBYSCORE', KEYS[i], '-inf', ARGV[3])
+    redis.call('ZADD', KEYS[i], expires, ARGV[1])
+end
+return count
+"""
+DISCONNECT_SCRIPT = """
+local count = redis.call('DECR', KEYS[1])
+if count > 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+    return count
+end
+redis.call('DEL', KEYS[1])
+for i = 2, #KEYS do
+    redis.call('ZREM', KEYS[i], ARGV[1])
+end
+return 0
+"""
+HEARTBEAT_SCRIPT = """
+if redis.call('EXPIRE', KEYS[1], ARGV[2]) == 0 then
+    return 0
+end
+local expires = tonumber(ARGV[3]) + tonumber(ARGV[2])
+for i = 2, #KEYS do
+    redis.call('ZADD', KEYS[i], expires, ARGV[1])
+end
+return 1
+"""
+
+
+def presence_ttl():
+    return getattr(settings, 'PRESENCE_TTL', 90)
+
+
+def heartbeat_interval():
+    return getattr(settings, 'PRESENCE_HEARTBEAT_INTERVAL', 30)
+
+
+def connections_key(user_id):
+    return f'presence:connections:{user_id}'
+
+
+def language_key(language_id):
+    return f'presence:lang:{language_id}'
+
+
+def language_group(language_id):
+    return f'presence.lang.{language_id}'
+
+
+class MemoryPresenceStore:
+    def __init__(self):
+        self._connections = defaultdict(int)
+        self._online = defaultdict(set)
+
+    async def connect(self, user_id, language_id):
+        """Count a new connection, True when the user just came online."""
+        self._connections[user_id] += 1
+        if self._connections[user_id] > 1:
+            return False
+        if language_id is not None:
+            self._online[language_id].add(user_id)
+        return True
+
+    async def disconnect(self, user_id, language_id):
+        """Drop a connection, True when it was the user's last one."""
+        self._connections[user_id] -= 1
+        if self._connections[user_id] > 0:
+            return False
+        del self._connections[user_id]
+        if language_id is not None:
+            self._online[language_id].discard(user_id)
+        return True
+
+    async def heartbeat(self, user_id, language_id):
+        """Nothing expires in memory, the process takes it all down with it."""
+
+    async def online_for_language(self, language_id):
+        return set(self._online.get(language_id, ()))
+
+    async def online_count(self):
+        return len(self._connections)
+
+
+class RedisPresenceStore:
+    def __init__(self, url):
+        self._redis = Redis.from_url(url, decode_responses=True)
+        self._connect = self._redis.register_script(CONNECT_SCRIPT)
+        self._disconnect = self._redis.register_script(DISCONNECT_SCRIPT)
+        self._heartbeat = self._redis.register_script(HEARTBEAT_SCRIPT)
+
+    def _call(self, script, user_id, language_id):
+        keys = [connections_key(user_id), ONLINE_KEY]
+        if language_id is not None:
+            keys.append(language_key(language_id))
+        return script(keys=keys, args=[user_id, presence_ttl(), time.time()])
+
+    async def connect(self, user_id, language_id):
+        return await self._call(self._connect, user_id, language_id) == 1
+
+    async def disconnect(self, user_id, language_id):
+        return await self._call(self._disconnect, user_id, language_id) == 0
+
+    async def heartbeat(self, user_id, language_id):
+        """Keep the user's connection counter and set entries from expiring."""
+        await self._call(self._heartbeat, user_id, language_id)
+
+    async def online_for_language(self, language_id):
+        members = await self._redis.zrangebyscore(language_key(language_id), time.time(), '+inf')
+        return {int(user_id) for user_id in members}
+
+    async def online_count(self):
+        return await self._redis.zcount(ONLINE_KEY, time.time(), '+inf')
+
+
+_store = None
+
+
+def get_presence_store():
+    global _store
+    if _store is None:
+        url = getattr(settings, 'PRESENCE_REDIS_URL', '')
+        _store = RedisPresenceStore(url) if url else MemoryPresenceStore()
+    return _store
+
+
+class PresenceBatcher:
+    """Coalesce presence changes per language and flush them periodically."""
+
+    def __init__(self):
+        self._pending = defaultdict(dict)
+        self._task = None
+
+    @property
+    def interval(self):
+        return getattr(settings, 'PRESENCE_FLUSH_INTERVAL', 0.5)
+
+    def mark(self, language_id, user_id, online):
+        if language_id is None:
+            return
+        # Only the latest state per user matters, a connect/disconnect flap
+        # within one interval collapses into a single entry.
+        self._pending[language_id][user_id] = online
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = loop.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.interval)
+        await self.flush()
+
+    async def flush(self):
+        pending, self._pending = self._pending, defaultdict(dict)
+        layer = get_channel_layer()
+        for language_id, changes in pending.items():
+            await layer.group_send(language_group(language_id), {
+                'type': 'presence.update',
+                'language': language_id,
+                'online': sorted(pk for pk, online in changes.items() if online),
+                'offline': sorted(pk for pk, online in changes.items() if not online),
+            })
+
+
+batcher = PresenceBatcher()
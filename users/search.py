@@ -0,0 +1,161 @@
+"""
+Full-text search over first_name, last_name and bio.
+
+The searchable text lives in a side table keyed by user id: an FTS5 virtual
+table on SQLite, a tsvector column with a GIN index on PostgreSQL (both
+created by migration 0006). Rows are rewritten from users_user whenever a
+user saves one of the indexed fields, inside the same transaction, so the
+index never lags the profile. Other backends fall back to icontains.
+"""
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+
+from .models import User
+
+SEARCH_TABLE = 'users_user_search'
+SEARCH_FIELDS = ('first_name', 'last_name', 'bio')
+MAX_TERMS = 10
+
+# Names weigh more than the bio: FTS5 bm25() column weights, tsvector labels.
+SQLITE_WEIGHTS = (10.0, 10.0, 1.0)
+POSTGRES_DOCUMENT = (
+    "setweight(to_tsvector('simple', coalesce(first_name, '') || ' ' || coalesce(last_name, '')), 'A')"
+    " || setweight(to_tsvector('simple', coalesce(bio, '')), 'B')"
+)
+
+SQLITE_CREATE = (
+    f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+    "first_name, last_name, bio, tokenize = 'unicode61 remove_diacritics 2')"
+)
+POSTGRES_CREATE = (
+    f"CREATE TABLE {SEARCH_TABLE} ("
+    "user_id bigint PRIMARY KEY REFERENCES users_user (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+    "document tsvector NOT NULL)",
+    f"CREATE INDEX {SEARCH_TABLE}_document_idx ON {SEARCH_TABLE} USING gin (document)",
+)
+
+
+def is_supported(using='default'):
+    return connections[using].vendor in ('sqlite', 'postgresql')
+
+
+def search_terms(query):
+    """Word tokens of a free-text query, stripped of any search syntax."""
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+def create_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(SQLITE_CREATE)
+    elif vendor == 'postgresql':
+        for statement in POSTGRES_CREATE:
+            schema_editor.execute(statement)
+    else:
+        return
+    rebuild(schema_editor.connection.alias)
+
+
+def drop_index(schema_editor):
+    if is_supported(schema_editor.connection.alias):
+        schema_editor.execute(f'DROP TABLE {SEARCH_TABLE}')
+
+
+def rebuild(using='default'):
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        cursor.execute(_insert_sql(connections[using].vendor, where=''))
+
+
+def _insert_sql(vendor, where):
+    if vendor == 'sqlite':
+        return (
+            f'INSERT INTO {SEARCH_TABLE} (rowid, first_name, last_name, bio) '
+            f'SELECT id, first_name, last_name, bio FROM users_user {where}'
+        )
+    return (
+        f'INSERT INTO {SEARCH_TABLE} (user_id, document) '
+        f'SELECT id, {POSTGRES_DOCUMENT} FROM users_user {where}'
+    )
+
+
+def _key_column(vendor):
+    return 'rowid' if vendor == 'sqlite' else 'user_id'
+
+
+def index_users(user_ids, using='default'):
+    """Rewrite the search rows of the given users from users_user."""
+    if not user_ids or not is_supported(using):
+        return
+    vendor = connections[using].vendor
+    placeholders = ', '.join(['%s'] * len(user_ids))
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE {_key_column(vendor)} IN ({placeholders})', list(user_ids),
+        )
+        cursor.execute(_insert_sql(vendor, f'WHERE id IN ({placeholders})'), list(user_ids))
+
+
+def remove_users(user_ids, using='default'):
+    if not user_ids or not is_supported(using):
+        return
+    vendor = connections[using].vendor
+    placeholders = ', '.join(['%s'] * len(user_ids))
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE {_key_column(vendor)} IN ({placeholders})', list(user_ids),
+        )
+
+
+def search_user_ids(query, limit=20, using=None, active_only=True):
+    """
+    [(user_id, rank)] best match first; every term must match, as a prefix.
+    Deactivated users are left out unless ``active_only`` is False (admin).
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+    using = using or router.db_for_read(User)
+    vendor = connections[using].vendor
+    key = f'{SEARCH_TABLE}.{_key_column(vendor)}'
+    join = f'JOIN users_user ON users_user.id = {key} ' if active_only else ''
+    active = 'AND users_user.is_active = %s ' if active_only else ''
+    active_params = [True] if active_only else []
+    with connections[using].cursor() as cursor:
+        if vendor == 'sqlite':
+            match = ' '.join(f'"{term}"*' for term in terms)
+            weights = ', '.join(str(weight) for weight in SQLITE_WEIGHTS)
+            # bm25() is lower for better matches.
+            cursor.execute(
+                f'SELECT {key}, -bm25({SEARCH_TABLE}, {weights}) AS rank FROM {SEARCH_TABLE} {join}'
+                f'WHERE {SEARCH_TABLE} MATCH %s {active}ORDER BY rank DESC LIMIT %s',
+                [match, *active_params, limit],
+            )
+        else:
+            cursor.execute(
+                f'SELECT {key}, ts_rank_cd(document, query) AS rank '
+                f'FROM {SEARCH_TABLE} {join}CROSS JOIN to_tsquery(\'simple\', %s) AS query '
+                f'WHERE document @@ query {active}ORDER BY rank DESC LIMIT %s',
+                [' & '.join(f'{term}:*' for term in terms), *active_params, limit],
+            )
+        return [(user_id, float(rank)) for user_id, rank in cursor.fetchall()]
+
+
+def search_users(query, limit=20, exclude=None, using=None):
+    """Matching active users in rank order."""
+    using = using or router.db_for_read(User)
+    if not is_supported(using):
+        terms = search_terms(query)
+        if not terms:
+            return []
+        queryset = User.objects.using(using).filter(is_active=True).exclude(pk=exclude)
+        for term in terms:
+            queryset = queryset.filter(
+                Q(first_name__icontains=term) | Q(last_name__icontains=term) | Q(bio__icontains=term)
+            )
+        return list(queryset.select_related('native_language').order_by('id')[:limit])
+    ranked = [user_id for user_id, _rank in search_user_ids(query, limit + 1, using)]
+    users = User.objects.using(using).select_related('native_language').in_bulk(ranked)
+    return [users[pk] for pk in ranked if pk in users and pk != exclude][:limit]
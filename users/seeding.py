@@ -0,0 +1,89 @@
+"""
+Synthetic user populations for benchmarks.
+
+Language popularity follows a Zipf-like curve (a few languages dominate,
+most have a long tail of speakers), the way real sign-ups do, so indexes
+and partner matching are measured on realistic selectivity. Rows are
+produced in the import_data format and written through
+users.bulk.UserImporter.
+"""
+import random
+
+from .bulk import UserImporter
+from .catalogs import get_catalog
+from .models import Goal, Interest, Language, UserLanguage
+
+LANGUAGES = [
+    ('en', 'English'), ('es', 'Spanish'), ('zh', 'Chinese'), ('hi', 'Hindi'), ('ar', 'Arabic'),
+    ('fr', 'French'), ('pt', 'Portuguese'), ('ru', 'Russian'), ('de', 'German'), ('ja', 'Japanese'),
+    ('uk', 'Ukrainian'), ('pl', 'Polish'), ('it', 'Italian'), ('tr', 'Turkish'), ('ko', 'Korean'),
+    ('nl', 'Dutch'), ('sv', 'Swedish'), ('cs', 'Czech'), ('el', 'Greek'), ('he', 'Hebrew'),
+    ('fi', 'Finnish'), ('no', 'Norwegian'), ('da', 'Danish'), ('hu', 'Hungarian'), ('ro', 'Romanian'),
+    ('vi', 'Vietnamese'), ('th', 'Thai'), ('id', 'Indonesian'), ('fa', 'Persian'), ('ka', 'Georgian'),
+]
+GOALS = ['Travel', 'Work', 'Study abroad', 'Exams', 'Friends', 'Family', 'Culture', 'Relocation']
+INTERESTS = [
+    'Music', 'Movies', 'Books', 'Sports', 'Cooking', 'Gaming', 'Art', 'Science', 'Tech',
+    'History', 'Hiking', 'Photography', 'Politics', 'Fashion', 'Anime', 'Podcasts',
+]
+TIMEZONES = [
+    'UTC', 'Europe/London', 'Europe/Berlin', 'Europe/Kyiv', 'Europe/Madrid', 'America/New_York',
+    'America/Chicago', 'America/Los_Angeles', 'America/Sao_Paulo', 'Asia/Tokyo', 'Asia/Shanghai',
+    'Asia/Kolkata', 'Asia/Dubai', 'Australia/Sydney', 'Africa/Cairo',
+]
+BIO_WORDS = (
+    'love learning languages travel music coffee books hiking jazz films teacher student engineer '
+    'designer cooking football chess photography history science startups writing podcasts yoga'
+).split()
+ZIPF_EXPONENT = 1.1
+
+
+def zipf_weights(count, exponent=ZIPF_EXPONENT):
+    return [1 / (rank ** exponent) for rank in range(1, count + 1)]
+
+
+def ensure_catalogs(language_count=len(LANGUAGES)):
+    """Create the seed languages, goals and interests that are missing."""
+    existing = set(Language.objects.values_list('code', flat=True))
+    Language.objects.bulk_create(
+        Language(code=code, name=name) for code, name in LANGUAGES[:language_count] if code not in existing
+    )
+    for model, names in ((Goal, GOALS), (Interest, INTERESTS)):
+        existing = set(model.objects.values_list('name', flat=True))
+        model.objects.bulk_create(model(name=name) for name in names if name not in existing)
+    for model in (Language, Goal, Interest):
+        get_catalog(model).invalidate()
+
+
+def generate_users(count, language_count=len(LANGUAGES), seed=0, prefix='seed'):
+    """Yield ``count`` user rows in the import_data format."""
+    rng = random.Random(seed)
+    codes = [code for code, _name in LANGUAGES[:language_count]]
+    weights = zipf_weights(len(codes))
+    levels = [code for code, _label in UserLanguage.PROFICIENCY_CHOICES]
+    for i in range(count):
+        native = rng.choices(codes, weights)[0]
+        learning = {}
+        for _ in range(rng.randint(1, 4)):
+            code = rng.choices(codes, weights)[0]
+            if code != native:
+                learning[code] = rng.choice(levels)
+        yield {
+            'username': f'{prefix}{i}',
+            'email': f'{prefix}{i}@example.com',
+            'first_name': f'First{i}',
+            'last_name': f'Last{i}',
+            'bio': ' '.join(rng.sample(BIO_WORDS, rng.randint(3, 12))),
+            'birth_date': '',
+            'timezone': rng.choice(TIMEZONES),
+            'native_language': native,
+            'learning': learning,
+            'goals': rng.sample(GOALS, rng.randint(0, 3)),
+            'interests': rng.sample(INTERESTS, rng.randint(0, 5)),
+        }
+
+
+def seed_users(count, language_count=len(LANGUAGES), seed=0, prefix='seed', chunk_size=5000):
+    ensure_catalogs(language_count)
+    importer = UserImporter(chunk_size=chunk_size)
+    return importer.run(generate_users(count, language_count, seed, prefix))
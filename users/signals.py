@@ -0,0 +1,121 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from allauth.account.signals import user_signed_up
+from django.contrib.auth.signals import user_logged_in, user_login_failed
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils.timezone import now
+
+from .auth import invalidate_users
+from .cache import invalidate_profile
+from .catalogs import get_catalog
+from .matching import partner_index
+from .metrics import registry
+from .models import AvailabilitySlot, Goal, Interest, Language, User, UserLanguage
+from .search import SEARCH_FIELDS, index_users, remove_users
+
+_muted = ContextVar('user_language_signals_muted', default=False)
+
+
+@contextmanager
+def user_language_signals_muted():
+    """Skip the per-row UserLanguage invalidation, the caller does it once."""
+    token = _muted.set(True)
+    try:
+        yield
+    finally:
+        _muted.reset(token)
+
+
+def _profile_changed(user_ids):
+    invalidate_profile(user_ids)
+    transaction.on_commit(lambda: partner_index.users_changed(user_ids))
+
+
+def _related_changed(user_ids):
+    # User.save() bumps the stamp itself; edits to related rows do it here.
+    User.objects.filter(pk__in=user_ids).update(profile_updated_at=now())
+    invalidate_users(user_ids)
+    _profile_changed(user_ids)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    invalidate_users([instance.pk])
+    # Logging in only touches last_login, which no profile view renders.
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    if not update_fields or set(update_fields) & set(SEARCH_FIELDS):
+        index_users([instance.pk], using=kwargs.get('using', 'default'))
+    _profile_changed([instance.pk])
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    # instance.pk is None by the time the commit callback runs.
+    user_ids = [instance.pk]
+    invalidate_users(user_ids)
+    remove_users(user_ids, using=kwargs.get('using', 'default'))
+    invalidate_profile(user_ids)
+    partner_index.remove_user(instance.pk)
+    transaction.on_commit(lambda: partner_index.publish(user_ids))
+
+
+@receiver(post_save, sender=UserLanguage)
+@receiver(post_delete, sender=UserLanguage)
+def user_language_changed(sender, instance, **kwargs):
+    if _muted.get():
+        return
+    _related_changed([instance.user_id])
+
+
+@receiver(post_save, sender=AvailabilitySlot)
+@receiver(post_delete, sender=AvailabilitySlot)
+def availability_changed(sender, instance, **kwargs):
+    _related_changed([instance.user_id])
+
+
+@receiver(m2m_changed, sender=User.goals.through)
+@receiver(m2m_changed, sender=User.interests.through)
+def user_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            _related_changed([instance.pk])
+        return
+    # instance is a Goal/Interest here and pk_set holds user ids, except for
+    # clear() where the affected users have to be collected beforehand.
+    if action == 'pre_clear':
+        instance._cleared_user_ids = list(instance.user_set.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        _related_changed(getattr(instance, '_cleared_user_ids', []))
+    elif action.startswith('post_') and pk_set:
+        _related_changed(sorted(pk_set))
+
+
+@receiver(post_save, sender=Language)
+@receiver(post_delete, sender=Language)
+@receiver(post_save, sender=Goal)
+@receiver(post_delete, sender=Goal)
+@receiver(post_save, sender=Interest)
+@receiver(post_delete, sender=Interest)
+def catalog_changed(sender, **kwargs):
+    catalog = get_catalog(sender)
+    catalog.invalidate()
+    transaction.on_commit(catalog.invalidate)
+
+
+@receiver(user_signed_up)
+def count_signup(sender, **kwargs):
+    registry.inc('auth_signups_total')
+
+
+@receiver(user_logged_in)
+def count_login(sender, **kwargs):
+    registry.inc('auth_logins_total')
+
+
+@receiver(user_login_failed)
+def count_login_failure(sender, **kwargs):
+    registry.inc('auth_login_failures_total')
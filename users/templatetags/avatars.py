@@ -0,0 +1,23 @@
+from django import template
+from django.core.files.storage import default_storage
+
+register = template.Library()
+
+
+def _url(user, size, extension):
+    name = user.avatar_thumbnail(size, extension)
+    return default_storage.url(name) if name else ''
+
+
+@register.inclusion_tag('users/avatar.html')
+def avatar(user, size, css_class='rounded-circle'):
+    """Thumbnail of ``size`` (plus a 2x variant), or a placeholder until it is processed."""
+    context = {'user': user, 'size': size, 'css_class': css_class}
+    if user.avatar_thumbnail(size):
+        context.update({
+            'webp': _url(user, size, 'webp'),
+            'jpg': _url(user, size, 'jpg'),
+            'webp_2x': _url(user, size * 2, 'webp'),
+            'jpg_2x': _url(user, size * 2, 'jpg'),
+        })
+    return context
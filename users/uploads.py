@@ -0,0 +1,109 @@
+"""
+Bounded avatar uploads.
+
+:class:`AvatarUploadHandler` streams the avatar straight to a temporary file
+and checks it while the chunks arrive: the declared content type and length
+up front, the running byte count on every chunk, and the real image format
+and dimensions as soon as Pillow can parse the header. A failing upload is
+dropped at that point instead of after the whole body has been received.
+A header Pillow cannot parse within HEADER_SNIFF_LIMIT bytes (a JPEG with a
+large ICC profile or EXIF block ahead of its frame header) is not rejected:
+the form's ImageField and check_dimensions look at the complete file.
+"""
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadhandler import SkipFile, TemporaryFileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, UnidentifiedImageError
+
+# Pillow format names accepted for avatars and their MIME types.
+AVATAR_FORMATS = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'WEBP': 'image/webp',
+    'GIF': 'image/gif',
+}
+
+# Stop sniffing the header after this many bytes and leave it to the form.
+HEADER_SNIFF_LIMIT = 64 * 1024
+
+
+def max_upload_size():
+    return getattr(settings, 'AVATAR_MAX_UPLOAD_SIZE', 5 * 1024 * 1024)
+
+
+def max_dimension():
+    return getattr(settings, 'AVATAR_MAX_DIMENSION', 4096)
+
+
+def max_pixels():
+    return getattr(settings, 'AVATAR_MAX_PIXELS', 16 * 1024 * 1024)
+
+
+def check_dimensions(width, height):
+    """Error message for an image that is too large to decode safely, or None."""
+    limit = max_dimension()
+    if width > limit or height > limit or width * height > max_pixels():
+        return f'Image dimensions must not exceed {limit}×{limit} pixels.'
+    return None
+
+
+def check_size(size):
+    if size > max_upload_size():
+        return f'Avatar must be smaller than {filesizeformat(max_upload_size())}.'
+    return None
+
+
+class AvatarUploadHandler(TemporaryFileUploadHandler):
+    """Temporary-file upload handler that validates ``field_name`` while streaming."""
+
+    def __init__(self, request=None, field_name='avatar'):
+        super().__init__(request)
+        self.field_name = field_name
+        self.errors = {}
+        self._checking = False
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        self._checking = field_name == self.field_name
+        if not self._checking:
+            return
+        self._received = 0
+        self._header = bytearray()
+        if content_type not in AVATAR_FORMATS.values():
+            self._reject('Upload a JPEG, PNG, WebP or GIF image.')
+        if content_length:
+            self._reject(check_size(content_length))
+
+    def receive_data_chunk(self, raw_data, start):
+        if self._checking:
+            self._received += len(raw_data)
+            self._reject(check_size(self._received))
+            if self._header is not None:
+                self._check_header(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def _check_header(self, raw_data):
+        # Image.open() only parses the header, no pixel data is decoded here.
+        self._header += raw_data[:HEADER_SNIFF_LIMIT - len(self._header)]
+        try:
+            with Image.open(BytesIO(self._header)) as image:
+                image_format, size = image.format, image.size
+        except Image.DecompressionBombError:
+            self._reject(f'Image dimensions must not exceed {max_dimension()}×{max_dimension()} pixels.')
+        except (UnidentifiedImageError, OSError, SyntaxError):
+            if len(self._header) >= HEADER_SNIFF_LIMIT:
+                self._header = None
+            return
+        self._header = None
+        if image_format not in AVATAR_FORMATS:
+            self._reject('Upload a JPEG, PNG, WebP or GIF image.')
+        self._reject(check_dimensions(*size))
+
+    def _reject(self, message):
+        if message:
+            self.errors[self.field_name] = message
+            self._checking = False
+            self._header = None
+            raise SkipFile(message)
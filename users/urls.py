@@ -5,4 +5,10 @@ urlpatterns = [
     path('profile/', views.profile_view, name='profile'),
     path('profile/edit/', views.profile_edit, name='profile_edit'),
     path('profile/add-language/', views.add_language, name='add_language'),
+    path('profile/languages/', views.manage_languages, name='manage_languages'),
+    path('profile/availability/', views.manage_availability, name='manage_availability'),
+    path('partners/', views.partner_list, name='partners'),
+    path('partners/directory/', views.partner_directory, name='partner_directory'),
+    path('partners/search/', views.partner_search, name='partner_search'),
+    path('metrics', views.metrics, name='metrics'),
 ]
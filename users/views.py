@@ -1,19 +1,71 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from .forms import UserProfileForm, UserLanguageForm
-from .models import UserLanguage
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject, empty
+from django.views.decorators.http import require_GET
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from .avatars import schedule_avatar_processing
+from .cache import not_modified_response, profile_cache_timeout, profile_validators, set_profile_validators
+from .catalogs import catalog_version
+from .directory import filter_directory, keyset_page
+from .bulk import set_user_languages
+from .forms import AvailabilityFormSet, PartnerDirectoryForm, UserProfileForm, UserLanguageForm, UserLanguagesForm
+from .matching import MIN_SHARED_MINUTES, find_partners, partner_index
+from .metrics import registry, render_prometheus
+from .models import User, UserLanguage
+from .search import search_users
+from .uploads import AvatarUploadHandler
 
 @login_required
 def profile_view(request):
-    return render(request, 'users/profile.html', {'user': request.user})
+    user_id = request.user.pk
+    version = catalog_version()
+    # request.user carries profile_updated_at, so a repeat visit is answered
+    # with a 304 before anything is rendered.
+    etag, last_modified = profile_validators(request, request.user, version)
+    response = not_modified_response(request, etag, last_modified)
+    if response is not None:
+        return set_profile_validators(response, etag, last_modified)
+    # Only loaded when one of the cached fragments has to be re-rendered.
+    profile_user = SimpleLazyObject(lambda: User.objects.with_profile().get(pk=user_id))
+    response = render(request, 'users/profile.html', {
+        'profile_user': profile_user,
+        'profile_user_id': user_id,
+        'catalog_version': version,
+        'cache_timeout': profile_cache_timeout(),
+    })
+    result = 'hit' if profile_user._wrapped is empty else 'miss'
+    registry.inc('cache_lookups_total', cache='profile', result=result)
+    return set_profile_validators(response, etag, last_modified)
 
 @login_required
+@csrf_exempt
 def profile_edit(request):
+    # The upload handler has to be in place before anything reads the body,
+    # so CSRF is enforced on the inner view instead of by the middleware.
+    upload_handler = AvatarUploadHandler(request)
+    request.upload_handlers = [upload_handler]
+    return _profile_edit(request, upload_handler)
+
+@csrf_protect
+def _profile_edit(request, upload_handler):
     if request.method == 'POST':
         form = UserProfileForm(request.POST, request.FILES, instance=request.user)
+        for field, error in upload_handler.errors.items():
+            form.add_error(field, error)
         if form.is_valid():
-            form.save()
+            avatar_changed = 'avatar' in form.changed_data
+            if avatar_changed:
+                form.instance.avatar_thumbnails = {}
+            user = form.save()
+            if avatar_changed and user.avatar:
+                user_id = user.pk
+                transaction.on_commit(lambda: schedule_avatar_processing(user_id))
             messages.success(request, 'Your profile has been updated!')
             return redirect('profile')
     else:
@@ -33,3 +85,82 @@ def add_language(request):
     else:
         form = UserLanguageForm()
     return render(request, 'users/add_language.html', {'form': form})
+
+@login_required
+def manage_languages(request):
+    """All learning languages edited in one form and saved in one transaction."""
+    levels = dict(UserLanguage.objects.filter(user_id=request.user.pk).values_list('language_id', 'proficiency'))
+    form = UserLanguagesForm(request.POST or None, levels=levels)
+    if request.method == 'POST' and form.is_valid():
+        set_user_languages(request.user.pk, form.levels())
+        messages.success(request, 'Languages updated!')
+        return redirect('profile')
+    return render(request, 'users/manage_languages.html', {'form': form})
+
+@login_required
+def manage_availability(request):
+    """Weekly slots in the user's own timezone, placed on the UTC week by users.availability."""
+    formset = AvailabilityFormSet(request.POST or None, instance=request.user)
+    if request.method == 'POST' and formset.is_valid():
+        formset.save()
+        messages.success(request, 'Availability updated!')
+        return redirect('profile')
+    return render(request, 'users/manage_availability.html', {'formset': formset})
+
+@login_required
+def partner_list(request):
+    # ?available=1 keeps only partners free at the same time for an hour a week.
+    available = bool(request.GET.get('available'))
+    matches = find_partners(request.user, limit=20, min_overlap=MIN_SHARED_MINUTES if available else 0)
+    return render(request, 'users/partners.html', {'matches': matches, 'available': available})
+
+@login_required
+def partner_directory(request):
+    form = PartnerDirectoryForm(request.GET)
+    users, next_cursor = [], None
+    if form.is_valid():
+        queryset = filter_directory(User.objects.filter(is_active=True).exclude(pk=request.user.pk), form.cleaned_data)
+        queryset = queryset.select_related('native_language').prefetch_related(
+            Prefetch('userlanguage_set', queryset=UserLanguage.objects.select_related('language').order_by('pk')),
+        )
+        users, next_cursor = keyset_page(queryset, form.cleaned_data['after'])
+    next_query = None
+    if next_cursor is not None:
+        params = request.GET.copy()
+        params['after'] = next_cursor
+        next_query = params.urlencode()
+    return render(request, 'users/directory.html', {
+        'form': form,
+        'users': users,
+        'next_query': next_query,
+        # Only matched partners get a Message button, see chat.views.
+        'partner_ids': partner_index.candidates(request.user.pk),
+    })
+
+@login_required
+def partner_search(request):
+    query = request.GET.get('q', '').strip()
+    results = search_users(query, limit=20, exclude=request.user.pk) if query else []
+    return render(request, 'users/search.html', {
+        'query': query,
+        'results': results,
+        'partner_ids': partner_index.candidates(request.user.pk),
+    })
+
+def _metrics_allowed(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    allowed_ips = getattr(settings, 'METRICS_ALLOWED_IPS', ())
+    if not token and not allowed_ips:
+        return False
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return False
+    # Behind a reverse proxy REMOTE_ADDR is the proxy's address, see .env.example.
+    return not allowed_ips or request.META.get('REMOTE_ADDR') in allowed_ips
+
+
+@require_GET
+def metrics(request):
+    # Internal endpoint, closed unless METRICS_TOKEN or METRICS_ALLOWED_IPS is set.
+    if not _metrics_allowed(request):
+        raise Http404
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')